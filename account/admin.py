@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 
 from .models import RecycleUser, User
+from .signals import invalidate_users_on_commit
 
 
 # Register your models here.
@@ -72,10 +73,13 @@ class RecycleUserAdmin(admin.ModelAdmin):
         "phone",
         "deleted_at",
     )
+    ordering = ("-deleted_at",)
 
     def get_queryset(self, request):
         return RecycleUser.deleted_object.filter(is_deleted=True)
 
     @admin.action(description="Restore Deleted Items")
     def restore_deleted_items(self, request, queryset):
+        users = list(queryset.only("id", "phone"))
         queryset.update(is_deleted=False, deleted_at=None)
+        invalidate_users_on_commit(*users)
@@ -5,7 +5,13 @@ from django.contrib.auth.backends import ModelBackend
 from django.core.cache import caches
 from rest_framework.authentication import TokenAuthentication
 
-from account.core.tokens import decode_jwt
+from account.core.hashing import check_password
+from account.core.last_seen import last_seen_tracker
+from account.core.revocations import revocation_list
+from account.core.sessions import session_store
+from account.core.user_cache import user_cache
+from account.core.user_state import user_state_cache
+from account.core.tokens import decode_jwt, is_stateless_access_token
 from account.enums.fault_code import FaultCode
 from account.enums.user_state import UserSituation
 from account.models import User
@@ -23,7 +29,7 @@ class AbstractTokenAuthentication(ABC, TokenAuthentication):
     def get_user_from_payload(payload):
         user_id = payload.get("user_id")
         try:
-            user = User.objects.get(id=user_id)
+            user = user_cache.get(user_id)
         except:
             return None
         return user
@@ -32,7 +38,7 @@ class AbstractTokenAuthentication(ABC, TokenAuthentication):
     def validate_jti_token(payload):
         jti = payload.get("jti")
         user_id = payload.get("user_id")
-        if not caches["auth"].keys(f"user_{user_id} || {jti}"):
+        if not session_store.exists(user_id, jti):
             return None
         return True
 
@@ -47,10 +53,14 @@ class AccessTokenAuthentication(AbstractTokenAuthentication):
 
         if payload.get("token_type") != "access":
             return None, None
-        if not self.validate_jti_token(payload):
+        if is_stateless_access_token(payload):
+            if revocation_list.is_revoked(payload.get("jti")):
+                return None, None
+        elif not self.validate_jti_token(payload):
             return None, None
 
         user = self.get_user_from_payload(payload)
+        last_seen_tracker.touch(payload.get("user_id"), payload.get("jti"))
 
         return user, payload
 
@@ -68,6 +78,7 @@ class RefreshTokenAuthentication(AbstractTokenAuthentication):
             return None, None
 
         user = self.get_user_from_payload(payload)
+        last_seen_tracker.touch(payload.get("user_id"), payload.get("jti"))
 
         return user, payload
 
@@ -101,12 +112,16 @@ class WorkFlowTokenAuthentication(AbstractTokenAuthentication):
 
 class PhoneAuthBackend(ModelBackend):
     def authenticate(self, request, phone=None, password=None, **kwargs):
-        try:
-            user = User.objects.get(phone=phone)
-        except User.DoesNotExist:
+        state = user_state_cache.get(phone)
+        if not state or state["is_deleted"]:
+            return FaultCode.WRONG_PHONE_NUMBER.value
+
+        # the cached user has no password hash, so login reads the full row
+        user = self.get_user(state["id"])
+        if user is None:
             return FaultCode.WRONG_PHONE_NUMBER.value
 
-        if user.check_password(password):
+        if check_password(user, password):
             if self.user_can_authenticate(user):
                 return user
             else:
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.core.cache import caches
 
 from account.core.general import get_ip_from_request
+from account.core.otp_outbox import otp_outbox
 from account.utils import send_otp_with_sms
 
 
@@ -29,7 +30,10 @@ def generate_six_digit_code():
 
 def generate_otp_and_send(phone: str) -> Tuple[bool, str]:
     code = generate_six_digit_code()
-    result = send_otp_with_sms(phone, code)
+    if settings.OTP_DELIVERY == "outbox":
+        result = otp_outbox.enqueue(phone, code)
+    else:
+        result = send_otp_with_sms(phone, code)
     return result, code
 
 
@@ -0,0 +1,168 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Tuple
+
+from django.conf import settings
+
+from achareh import custom_exception
+
+logger = logging.getLogger(__name__)
+
+
+def setup_worker() -> None:
+    import django
+
+    django.setup()
+
+
+def check_password_in_worker(password: str, encoded: str) -> Tuple[float, bool, bool]:
+    from django.contrib.auth.hashers import get_hasher, identify_hasher
+
+    started_at = time.time()
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return started_at, False, False
+
+    preferred = get_hasher("default")
+    is_correct = hasher.verify(password, encoded)
+    must_update = hasher.algorithm != preferred.algorithm or preferred.must_update(
+        encoded
+    )
+    return started_at, is_correct, must_update
+
+
+def make_password_in_worker(password: str) -> Tuple[float, str]:
+    from django.contrib.auth.hashers import make_password
+
+    started_at = time.time()
+    return started_at, make_password(password)
+
+
+class PasswordHashingExecutor:
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "rejected": 0,
+            "fallbacks": 0,
+            "queue_seconds_total": 0.0,
+            "queue_seconds_max": 0.0,
+        }
+
+    @property
+    def config(self) -> dict:
+        return settings.PASSWORD_HASHING
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.config["ENABLED"]
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        # pools are not inherited by forked web workers, each process starts its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = None
+                    self._slots = threading.BoundedSemaphore(self.config["MAX_PENDING"])
+                    self._pid = os.getpid()
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.config["WORKERS"],
+                        mp_context=multiprocessing.get_context(
+                            self.config["START_METHOD"]
+                        ),
+                        initializer=setup_worker,
+                    )
+        return self._executor
+
+    def discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn, *args):
+        executor = self.get_executor()
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # a worker died (OOM killer, segfault), the next call starts a fresh pool
+            self.discard_executor(executor)
+            raise
+
+    def run(self, fn, *args):
+        self.get_executor()
+        slots = self._slots
+        if not slots.acquire(timeout=self.config["ACQUIRE_TIMEOUT"]):
+            self._count(rejected=1)
+            raise custom_exception.ServiceOverloaded
+
+        submitted_at = time.time()
+        try:
+            try:
+                started_at, *result = self.submit(fn, *args)
+            except BrokenProcessPool:
+                try:
+                    started_at, *result = self.submit(fn, *args)
+                except BrokenProcessPool:
+                    logger.warning(
+                        "Password hashing pool is broken, hashing in process"
+                    )
+                    self._count(fallbacks=1)
+                    started_at, *result = fn(*args)
+        finally:
+            slots.release()
+
+        self._count(calls=1, queue_seconds=max(started_at - submitted_at, 0.0))
+        return result
+
+    def _count(self, calls=0, rejected=0, fallbacks=0, queue_seconds=0.0) -> None:
+        with self._lock:
+            self.counters["calls"] += calls
+            self.counters["rejected"] += rejected
+            self.counters["fallbacks"] += fallbacks
+            self.counters["queue_seconds_total"] += queue_seconds
+            self.counters["queue_seconds_max"] = max(
+                self.counters["queue_seconds_max"], queue_seconds
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+hashing_executor = PasswordHashingExecutor()
+
+
+def check_password(user, raw_password: str) -> bool:
+    if not hashing_executor.is_enabled:
+        return user.check_password(raw_password)
+    if not raw_password or not user.has_usable_password():
+        return False
+
+    is_correct, must_update = hashing_executor.run(
+        check_password_in_worker, raw_password, user.password
+    )
+    if is_correct and must_update:
+        user.password = hash_password(raw_password)
+        user.save(update_fields=["password"])
+    return is_correct
+
+
+def hash_password(raw_password: str) -> str:
+    if not hashing_executor.is_enabled:
+        from django.contrib.auth.hashers import make_password
+
+        return make_password(raw_password)
+
+    (encoded,) = hashing_executor.run(make_password_in_worker, raw_password)
+    return encoded
@@ -0,0 +1,78 @@
+from typing import List
+
+import jwt
+
+from account.core.revocations import revocation_list
+from account.core.sessions import session_store
+from account.core.tokens import decode_jwt, is_stateless_access_token
+from account.models import User
+
+
+def introspect_tokens(tokens: List[str]) -> List[dict]:
+    results = [None] * len(tokens)
+    payloads = {}
+    for index, token in enumerate(tokens):
+        try:
+            payload = decode_jwt(token)
+        except jwt.ExpiredSignatureError:
+            results[index] = {"active": False, "error": "expired"}
+            continue
+        except jwt.PyJWTError:
+            results[index] = {"active": False, "error": "invalid"}
+            continue
+        if (
+            payload.get("token_type") != "access"
+            or not payload.get("user_id")
+            or not payload.get("jti")
+        ):
+            results[index] = {"active": False, "error": "invalid"}
+            continue
+        payloads[index] = payload
+
+    # stateless tokens are checked against the local revocation list, the rest
+    # against the session store in one round trip
+    stateful, stateless = [], []
+    for index, payload in payloads.items():
+        if is_stateless_access_token(payload):
+            stateless.append(index)
+        else:
+            stateful.append(index)
+
+    revoked = [
+        index
+        for index in stateless
+        if revocation_list.is_revoked(payloads[index]["jti"])
+    ]
+    live_sessions = session_store.exists_many(
+        [(payloads[index]["user_id"], payloads[index]["jti"]) for index in stateful]
+    )
+    revoked.extend(
+        index for index, is_live in zip(stateful, live_sessions) if not is_live
+    )
+    for index in revoked:
+        results[index] = {"active": False, "error": "revoked"}
+        del payloads[index]
+
+    if not payloads:
+        return results
+
+    active_users = set(
+        User.objects.filter(
+            id__in={payload["user_id"] for payload in payloads.values()},
+            is_deleted=False,
+            is_active=True,
+        ).values_list("id", flat=True)
+    )
+    for index, payload in payloads.items():
+        if payload["user_id"] not in active_users:
+            results[index] = {"active": False, "error": "inactive_user"}
+            continue
+        results[index] = {
+            "active": True,
+            "user_id": payload["user_id"],
+            "jti": payload["jti"],
+            "token_type": payload["token_type"],
+            "exp": payload["exp"],
+            "iat": payload["iat"],
+        }
+    return results
@@ -0,0 +1,99 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
+from django.conf import settings
+
+HMAC_ALGORITHM = "HS256"
+
+
+class VerificationKey(NamedTuple):
+    key: object
+    algorithm: str
+
+
+def key_algorithm(public_key) -> str:
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    raise ValueError(f"Unsupported signing key type {type(public_key).__name__}")
+
+
+# every "<kid>.pem" file in the keys directory is a private key and every
+# "<kid>.pub.pem" a retired public key still accepted for verification
+class Keyring:
+    def __init__(self, directory: str, active_kid: str, algorithm: str):
+        self.active_kid = active_kid
+        self.private_keys = {}
+        self.public_keys = {}
+
+        for path in sorted(Path(directory).glob("*.pem")):
+            data = path.read_bytes()
+            if path.name.endswith(".pub.pem"):
+                kid = path.name[: -len(".pub.pem")]
+                public_key = load_pem_public_key(data)
+            else:
+                kid = path.stem
+                self.private_keys[kid] = load_pem_private_key(data, password=None)
+                public_key = self.private_keys[kid].public_key()
+            # each key keeps its own algorithm, so a rotation may change the key type
+            self.public_keys[kid] = VerificationKey(
+                public_key, key_algorithm(public_key)
+            )
+
+        if active_kid not in self.private_keys:
+            raise ValueError(f"No private key for the active kid {active_kid!r}")
+        if self.algorithm != algorithm:
+            raise ValueError(
+                f"The active kid {active_kid!r} is a {self.algorithm} key, "
+                f"not {algorithm}"
+            )
+
+        self.jwks = {
+            "keys": [
+                dict(
+                    jwt.get_algorithm_by_name(key.algorithm).to_jwk(
+                        key.key, as_dict=True
+                    ),
+                    kid=kid,
+                    alg=key.algorithm,
+                    use="sig",
+                )
+                for kid, key in self.public_keys.items()
+            ]
+        }
+
+    @property
+    def algorithm(self) -> str:
+        return self.public_keys[self.active_kid].algorithm
+
+    @property
+    def signing_key(self):
+        return self.private_keys[self.active_kid]
+
+    def verification_key(self, kid: str) -> VerificationKey:
+        try:
+            return self.public_keys[kid]
+        except KeyError:
+            raise jwt.InvalidKeyError(f"Unknown kid {kid!r}")
+
+
+@lru_cache(maxsize=None)
+def load_keyring(directory: str, active_kid: str, algorithm: str) -> Keyring:
+    return Keyring(directory, active_kid, algorithm)
+
+
+def get_keyring() -> Optional[Keyring]:
+    config = settings.JWT_SIGNING
+    if config["ALGORITHM"] == HMAC_ALGORITHM:
+        return None
+    return load_keyring(
+        str(config["KEYS_DIR"]), config["ACTIVE_KID"], config["ALGORITHM"]
+    )
@@ -0,0 +1,85 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from account.core.sessions import SessionStore, session_store
+
+logger = logging.getLogger(__name__)
+
+
+# authenticated requests only touch an in-process dict, a background thread writes
+# the latest timestamp per session to redis every FLUSH_INTERVAL seconds
+class LastSeenTracker:
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        self.flushed = 0
+        self.dropped = 0
+
+    @property
+    def config(self) -> dict:
+        return settings.SESSION_ACTIVITY
+
+    def touch(self, user_id: int, jti: str) -> None:
+        if not self.config["ENABLED"] or not user_id or not jti:
+            return
+
+        with self._lock:
+            if len(self._pending) >= self.config["MAX_PENDING"]:
+                self.dropped += 1
+                self._wakeup.set()
+                return
+            self._pending[(user_id, jti)] = int(time.time())
+        self.ensure_worker()
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        last_seen = {}
+        for (user_id, jti), seen_at in pending.items():
+            last_seen.setdefault(user_id, {})[jti] = seen_at
+        try:
+            self.store.set_last_seen(last_seen)
+        except RedisError:
+            logger.warning("Could not flush session last seen", exc_info=True)
+            self.dropped += len(pending)
+            return 0
+
+        self.flushed += len(pending)
+        return len(pending)
+
+    def ensure_worker(self) -> None:
+        # the thread does not survive a fork, so each process starts its own
+        if self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+
+        with self._lock:
+            if self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self.run, name="session-last-seen", daemon=True
+            )
+            self._worker.start()
+            self._worker_pid = os.getpid()
+
+    def run(self) -> None:
+        while True:
+            self._wakeup.wait(self.config["FLUSH_INTERVAL"])
+            self._wakeup.clear()
+            self.flush()
+
+
+last_seen_tracker = LastSeenTracker(session_store)
+atexit.register(last_seen_tracker.flush)
@@ -0,0 +1,126 @@
+import time
+from typing import List, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+
+class OTPOutbox:
+    stream = "otp_outbox"
+    retries = "otp_outbox_retries"
+    group = "otp_workers"
+
+    def __init__(self, alias: str = "otp"):
+        self.alias = alias
+
+    @property
+    def connection(self):
+        return get_redis_connection(self.alias)
+
+    @property
+    def config(self) -> dict:
+        return settings.OTP_OUTBOX
+
+    def key(self, name: str) -> str:
+        return caches[self.alias].make_key(name)
+
+    def enqueue(
+        self, phone: str, code: str, attempt: int = 0, created_at: float = None
+    ) -> bool:
+        fields = {
+            "phone": phone,
+            "code": code,
+            "attempt": attempt,
+            "created_at": created_at or time.time(),
+        }
+        try:
+            self.connection.xadd(
+                self.key(self.stream),
+                fields,
+                maxlen=self.config["MAX_LENGTH"],
+                approximate=True,
+            )
+        except RedisError:
+            return False
+        return True
+
+    def ensure_group(self) -> None:
+        try:
+            self.connection.xgroup_create(
+                self.key(self.stream), self.group, id="0", mkstream=True
+            )
+        except RedisError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read(self, consumer: str, count: int, block_ms: int) -> List[Tuple[str, dict]]:
+        # messages a dead consumer read but never acknowledged come first
+        _, messages, *_ = self.connection.xautoclaim(
+            self.key(self.stream),
+            self.group,
+            consumer,
+            min_idle_time=self.config["CLAIM_IDLE_MS"],
+            count=count,
+        )
+        if not messages:
+            response = self.connection.xreadgroup(
+                self.group,
+                consumer,
+                {self.key(self.stream): ">"},
+                count=count,
+                block=block_ms,
+            )
+            messages = response[0][1] if response else []
+
+        return [
+            (
+                message_id.decode(),
+                {key.decode(): value.decode() for key, value in fields.items()},
+            )
+            for message_id, fields in messages
+            if fields
+        ]
+
+    def ack(self, message_id: str) -> None:
+        pipe = self.connection.pipeline()
+        pipe.xack(self.key(self.stream), self.group, message_id)
+        pipe.xdel(self.key(self.stream), message_id)
+        pipe.execute()
+
+    def schedule_retry(self, message_id: str, message: dict) -> bool:
+        attempt = int(message["attempt"]) + 1
+        if attempt >= self.config["MAX_ATTEMPTS"] or self.is_expired(message):
+            self.ack(message_id)
+            return False
+
+        due_at = time.time() + self.config["RETRY_BACKOFF"] * 2 ** (attempt - 1)
+        pipe = self.connection.pipeline()
+        pipe.zadd(
+            self.key(self.retries),
+            {
+                f'{message["phone"]}:{message["code"]}:{attempt}:{message["created_at"]}': due_at
+            },
+        )
+        pipe.xack(self.key(self.stream), self.group, message_id)
+        pipe.xdel(self.key(self.stream), message_id)
+        pipe.execute()
+        return True
+
+    def promote_due_retries(self) -> int:
+        now = time.time()
+        due = self.connection.zrangebyscore(self.key(self.retries), "-inf", now)
+        for member in due:
+            # only the worker that removes the member re-enqueues it
+            if self.connection.zrem(self.key(self.retries), member):
+                phone, code, attempt, created_at = member.decode().split(":")
+                self.enqueue(phone, code, int(attempt), float(created_at))
+        return len(due)
+
+    @staticmethod
+    def is_expired(message: dict) -> bool:
+        return time.time() - float(message["created_at"]) > settings.REDIS_OTP_TTL
+
+
+otp_outbox = OTPOutbox()
@@ -0,0 +1,69 @@
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from account.core.otp_outbox import OTPOutbox, otp_outbox
+from account.core.sms_providers import BaseSMSProvider, get_sms_provider
+
+logger = logging.getLogger(__name__)
+
+
+class OTPWorker:
+    def __init__(
+        self,
+        outbox: OTPOutbox = otp_outbox,
+        provider: BaseSMSProvider = None,
+        concurrency: int = 8,
+        block_ms: int = 1000,
+    ):
+        self.outbox = outbox
+        self.provider = provider or get_sms_provider()
+        self.concurrency = concurrency
+        self.block_ms = block_ms
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.stop_event = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.in_flight = set()
+
+    def run(self) -> None:
+        self.outbox.ensure_group()
+        while not self.stop_event.is_set():
+            self.run_once()
+        wait(self.in_flight)
+        self.executor.shutdown()
+
+    def run_once(self) -> None:
+        self.outbox.promote_due_retries()
+
+        free_slots = self.concurrency - len(self.in_flight)
+        if free_slots <= 0:
+            done, self.in_flight = wait(self.in_flight, return_when=FIRST_COMPLETED)
+            return
+
+        for message_id, message in self.outbox.read(
+            self.consumer, free_slots, self.block_ms
+        ):
+            self.in_flight.add(self.executor.submit(self.deliver, message_id, message))
+        self.in_flight = {future for future in self.in_flight if not future.done()}
+
+    def deliver(self, message_id: str, message: dict) -> bool:
+        if self.outbox.is_expired(message):
+            self.outbox.ack(message_id)
+            return False
+
+        try:
+            is_sent = self.provider.send_otp(message["phone"], message["code"])
+        except Exception:
+            logger.exception("OTP delivery through %s failed", self.provider.name)
+            is_sent = False
+
+        if is_sent:
+            self.outbox.ack(message_id)
+        elif not self.outbox.schedule_retry(message_id, message):
+            logger.warning("OTP for %s dropped after retries", message["phone"])
+        return is_sent
+
+    def stop(self, *args) -> None:
+        self.stop_event.set()
@@ -0,0 +1,90 @@
+from hashlib import blake2b
+from typing import Iterable, List
+
+from django.conf import settings
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+
+class KnownPhonesFilter:
+    key = "known_phones_bloom"
+
+    def __init__(self, alias: str = "default"):
+        self.alias = alias
+
+    @property
+    def config(self) -> dict:
+        return settings.KNOWN_PHONES_FILTER
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.config["ENABLED"]
+
+    @property
+    def connection(self):
+        return get_redis_connection(self.alias)
+
+    def make_key(self, key: str) -> str:
+        return caches[self.alias].make_key(key)
+
+    def positions(self, phone: str) -> List[int]:
+        digest = blake2b(phone.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(
+            digest[8:], "big"
+        )
+        size = self.config["SIZE_BITS"]
+        return [(first + i * second) % size for i in range(self.config["HASHES"])]
+
+    @property
+    def ready_bit(self) -> int:
+        return self.config["SIZE_BITS"]
+
+    def might_contain(self, phone: str) -> bool:
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.getbit(self.make_key(self.key), self.ready_bit)
+        for position in self.positions(phone):
+            pipe.getbit(self.make_key(self.key), position)
+        is_ready, *bits = pipe.execute()
+
+        # only a rebuild sets the bit past the filter, so a bitmap that was never built,
+        # was evicted, or was recreated by add() alone proves nothing
+        if not is_ready:
+            return True
+        return all(bits)
+
+    def is_unknown(self, phone: str) -> bool:
+        return self.is_enabled and not self.might_contain(phone)
+
+    def add(self, *phones: str) -> None:
+        self._set_bits(self.connection.pipeline(transaction=False), self.key, phones)
+
+    def rebuild(self, phones: Iterable[str], batch_size: int = 5000) -> int:
+        building_key = f"{self.key}_building"
+        self.connection.delete(self.make_key(building_key))
+
+        count, batch = 0, []
+        for phone in phones:
+            batch.append(phone)
+            if len(batch) >= batch_size:
+                count += self._flush(building_key, batch)
+                batch = []
+        count += self._flush(building_key, batch)
+
+        pipe = self.connection.pipeline()
+        pipe.setbit(self.make_key(building_key), self.ready_bit, 1)
+        pipe.rename(self.make_key(building_key), self.make_key(self.key))
+        pipe.execute()
+        return count
+
+    def _flush(self, key: str, phones: List[str]) -> int:
+        self._set_bits(self.connection.pipeline(transaction=False), key, phones)
+        return len(phones)
+
+    def _set_bits(self, pipe, key: str, phones: Iterable[str]) -> None:
+        for phone in phones:
+            for position in self.positions(phone):
+                pipe.setbit(self.make_key(key), position, 1)
+        pipe.execute()
+
+
+known_phones_filter = KnownPhonesFilter()
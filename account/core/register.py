@@ -4,6 +4,7 @@ from django.core.cache import caches
 
 from account.core.tokens import create_work_flow_token, save_work_flow_token_in_cache
 from account.models import User
+from achareh.custom_cache import CachePipeline
 
 
 def get_code_and_phone_from_serializer(serializer) -> Tuple[str, str]:
@@ -19,12 +20,16 @@ def is_otp_code_correct(main_code: str, user_input_code: str) -> bool:
 def create_user_and_set_work_flow_token(user_input_phone: str):
     user, _ = User.objects.get_or_create(phone=user_input_phone)
     work_flow_token, jti = create_work_flow_token(user.id)
-    save_work_flow_token_in_cache(user.id, jti)
-    delete_otp_code_from_cache(user_input_phone)
+    with CachePipeline() as pipe:
+        save_work_flow_token_in_cache(user.id, jti, pipe)
+        delete_otp_code_from_cache(user_input_phone, pipe)
     return work_flow_token
 
 
-def delete_otp_code_from_cache(phone: str) -> None:
+def delete_otp_code_from_cache(phone: str, pipe: CachePipeline = None) -> None:
+    if pipe is not None:
+        pipe.delete("otp", phone)
+        return
     caches["otp"].delete(phone)
 
 
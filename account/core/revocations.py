@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# scores come from the redis clock and scripts run one at a time, so a reader that
+# resumes from the highest score it has seen never skips an entry
+REVOKE_SCRIPT = """
+local now = redis.call("TIME")
+local score = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local ttl = tonumber(ARGV[1])
+for i = 2, #ARGV do
+    redis.call("ZADD", KEYS[1], score, ARGV[i])
+end
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", score - ttl)
+redis.call("EXPIRE", KEYS[1], ttl)
+return tostring(score)
+"""
+
+
+class RevocationList:
+    key = "revoked_jtis"
+
+    def __init__(self, alias: str = "auth"):
+        self.alias = alias
+        self._revoked = {}
+        self._watermark = 0.0
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        self._script = None
+
+    @property
+    def connection(self):
+        return get_redis_connection(self.alias)
+
+    @property
+    def config(self) -> dict:
+        return settings.STATELESS_ACCESS_TOKENS
+
+    @property
+    def script(self):
+        if self._script is None:
+            self._script = self.connection.register_script(REVOKE_SCRIPT)
+        return self._script
+
+    def revoke(self, *jtis: str) -> None:
+        if not jtis:
+            return
+        score = self.script(
+            keys=[caches[self.alias].make_key(self.key)],
+            args=[self.config["TTL"], *jtis],
+        )
+        with self._lock:
+            for jti in jtis:
+                self._revoked[jti] = float(score)
+
+    def is_revoked(self, jti: str) -> bool:
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        return jti in self._revoked
+
+    def refresh(self) -> None:
+        # one thread refreshes while the others keep reading the current list
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_refresh = time.monotonic() + self.config["REFRESH_INTERVAL"]
+            try:
+                entries = self.connection.zrangebyscore(
+                    caches[self.alias].make_key(self.key),
+                    self._watermark,
+                    "+inf",
+                    withscores=True,
+                )
+            except RedisError:
+                logger.warning("Could not refresh the revoked jtis", exc_info=True)
+                return
+
+            for jti, score in entries:
+                self._revoked[jti.decode()] = score
+                self._watermark = max(self._watermark, score)
+
+            expired_before = self._watermark - self.config["TTL"]
+            for jti, score in list(self._revoked.items()):
+                if score < expired_before:
+                    del self._revoked[jti]
+        finally:
+            self._lock.release()
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,213 @@
+import time
+from typing import Dict, List, Tuple
+
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+# replaces a session only while it still exists, so concurrent refreshes with the
+# same token cannot both mint a new session
+ROTATE_SCRIPT = """
+if redis.call("DEL", KEYS[1]) == 0 then
+    return 0
+end
+local ttl = tonumber(ARGV[4])
+local now = tonumber(ARGV[5])
+redis.call("ZREM", KEYS[3], ARGV[1])
+redis.call("HDEL", KEYS[4], ARGV[1])
+redis.call("SET", KEYS[2], ARGV[3], "EX", ttl)
+redis.call("ZADD", KEYS[3], now + ttl, ARGV[2])
+redis.call("ZREMRANGEBYSCORE", KEYS[3], "-inf", now)
+redis.call("EXPIRE", KEYS[3], ttl)
+return 1
+"""
+
+# only sessions still in the index get a timestamp, so a flush that lands after a
+# logout does not bring the jti back, and entries of expired sessions are dropped
+LAST_SEEN_SCRIPT = """
+local now = tonumber(ARGV[2])
+for i = 3, #ARGV, 2 do
+    local expires_at = redis.call("ZSCORE", KEYS[1], ARGV[i])
+    if expires_at and tonumber(expires_at) > now then
+        redis.call("HSET", KEYS[2], ARGV[i], ARGV[i + 1])
+    end
+end
+for _, jti in ipairs(redis.call("HKEYS", KEYS[2])) do
+    local expires_at = redis.call("ZSCORE", KEYS[1], jti)
+    if not expires_at or tonumber(expires_at) <= now then
+        redis.call("HDEL", KEYS[2], jti)
+    end
+end
+if redis.call("EXISTS", KEYS[2]) == 1 then
+    redis.call("EXPIRE", KEYS[2], tonumber(ARGV[1]))
+end
+"""
+
+
+class SessionStore:
+    def __init__(self, alias: str = "auth"):
+        self.alias = alias
+        self._rotate_script = None
+        self._last_seen_script = None
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def connection(self):
+        return get_redis_connection(self.alias)
+
+    @property
+    def timeout(self) -> int:
+        return self.cache.default_timeout
+
+    @staticmethod
+    def session_key(user_id: int, jti: str) -> str:
+        return f"user_{user_id} || {jti}"
+
+    @staticmethod
+    def index_key(user_id: int) -> str:
+        return f"sessions_of_user_{user_id}"
+
+    @staticmethod
+    def last_seen_key(user_id: int) -> str:
+        return f"sessions_last_seen_{user_id}"
+
+    def exists(self, user_id: int, jti: str) -> bool:
+        if not user_id or not jti:
+            return False
+        return self.cache.has_key(self.session_key(user_id, jti))
+
+    def exists_many(self, sessions: List[Tuple[int, str]]) -> List[bool]:
+        pipe = self.connection.pipeline(transaction=False)
+        for user_id, jti in sessions:
+            pipe.exists(self.cache.make_key(self.session_key(user_id, jti)))
+        return [bool(count) for count in pipe.execute()]
+
+    def save(self, user_id: int, jti: str, value) -> None:
+        now = time.time()
+        index_key = self.cache.make_key(self.index_key(user_id))
+
+        pipe = self.connection.pipeline()
+        pipe.set(
+            self.cache.make_key(self.session_key(user_id, jti)),
+            self.cache.client.encode(value),
+            ex=self.timeout,
+        )
+        pipe.zadd(index_key, {jti: now + self.timeout})
+        pipe.zremrangebyscore(index_key, "-inf", now)
+        pipe.expire(index_key, self.timeout)
+        pipe.execute()
+
+    def rotate(self, user_id: int, old_jti: str, new_jti: str, value) -> bool:
+        if self._rotate_script is None:
+            self._rotate_script = self.connection.register_script(ROTATE_SCRIPT)
+
+        is_rotated = self._rotate_script(
+            keys=[
+                self.cache.make_key(self.session_key(user_id, old_jti)),
+                self.cache.make_key(self.session_key(user_id, new_jti)),
+                self.cache.make_key(self.index_key(user_id)),
+                self.cache.make_key(self.last_seen_key(user_id)),
+            ],
+            args=[
+                old_jti,
+                new_jti,
+                self.cache.client.encode(value),
+                self.timeout,
+                time.time(),
+            ],
+        )
+        return bool(is_rotated)
+
+    def delete(self, user_id: int, jti: str) -> bool:
+        pipe = self.connection.pipeline()
+        pipe.delete(self.cache.make_key(self.session_key(user_id, jti)))
+        pipe.zrem(self.cache.make_key(self.index_key(user_id)), jti)
+        pipe.hdel(self.cache.make_key(self.last_seen_key(user_id)), jti)
+        is_deleted, _, _ = pipe.execute()
+        return bool(is_deleted)
+
+    def get_jtis(self, user_id: int) -> List[str]:
+        index_key = self.cache.make_key(self.index_key(user_id))
+
+        pipe = self.connection.pipeline()
+        pipe.zremrangebyscore(index_key, "-inf", time.time())
+        pipe.zrange(index_key, 0, -1)
+        _, jtis = pipe.execute()
+        return [jti.decode() for jti in jtis]
+
+    def get_all(self, user_id: int) -> Dict[str, object]:
+        jtis = self.get_jtis(user_id)
+        if not jtis:
+            return {}
+
+        values = self.connection.mget(
+            [self.cache.make_key(self.session_key(user_id, jti)) for jti in jtis]
+        )
+
+        sessions, stale_jtis = {}, []
+        for jti, value in zip(jtis, values):
+            if value is None:
+                stale_jtis.append(jti)
+                continue
+            sessions[jti] = self.cache.client.decode(value)
+
+        if stale_jtis:
+            self.connection.zrem(
+                self.cache.make_key(self.index_key(user_id)), *stale_jtis
+            )
+        return sessions
+
+    def delete_all(self, user_id: int) -> List[str]:
+        jtis = self.get_jtis(user_id)
+
+        pipe = self.connection.pipeline()
+        for jti in jtis:
+            pipe.delete(self.cache.make_key(self.session_key(user_id, jti)))
+        pipe.delete(self.cache.make_key(self.index_key(user_id)))
+        pipe.delete(self.cache.make_key(self.last_seen_key(user_id)))
+        pipe.execute()
+        return jtis
+
+    def get_last_seen(self, user_id: int) -> Dict[str, int]:
+        last_seen = self.connection.hgetall(
+            self.cache.make_key(self.last_seen_key(user_id))
+        )
+        return {jti.decode(): int(seen_at) for jti, seen_at in last_seen.items()}
+
+    def set_last_seen(self, last_seen: Dict[int, Dict[str, int]]) -> None:
+        if self._last_seen_script is None:
+            self._last_seen_script = self.connection.register_script(LAST_SEEN_SCRIPT)
+
+        now = time.time()
+        pipe = self.connection.pipeline(transaction=False)
+        for user_id, seen_by_jti in last_seen.items():
+            self._last_seen_script(
+                keys=[
+                    self.cache.make_key(self.index_key(user_id)),
+                    self.cache.make_key(self.last_seen_key(user_id)),
+                ],
+                args=[
+                    self.timeout,
+                    now,
+                    *(item for pair in seen_by_jti.items() for item in pair),
+                ],
+                client=pipe,
+            )
+        pipe.execute()
+
+    def add_to_index(self, user_id: int, jti: str) -> None:
+        key = self.cache.make_key(self.session_key(user_id, jti))
+        index_key = self.cache.make_key(self.index_key(user_id))
+
+        ttl = self.connection.ttl(key)
+        if ttl < 0:
+            return
+        pipe = self.connection.pipeline()
+        pipe.zadd(index_key, {jti: time.time() + ttl})
+        pipe.expire(index_key, self.timeout)
+        pipe.execute()
+
+
+session_store = SessionStore()
@@ -0,0 +1,209 @@
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from achareh.custom_request_metrics import record_sms
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 10,
+        window: float = 30,
+        open_seconds: float = 30,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.calls = deque()
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+            # half open lets a single trial call through
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record(self, is_success: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if is_success:
+                    self.state = self.CLOSED
+                    self.calls.clear()
+                else:
+                    self._open(now)
+                return
+
+            self.calls.append((now, is_success))
+            while self.calls and self.calls[0][0] < now - self.window:
+                self.calls.popleft()
+
+            failures = sum(1 for _, success in self.calls if not success)
+            if (
+                len(self.calls) >= self.min_calls
+                and failures / len(self.calls) >= self.failure_rate_threshold
+            ):
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self.opened_at = now
+        self.calls.clear()
+
+
+class ProviderMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, is_success: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.failures += not is_success
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "avg_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+                "max_seconds": self.max_seconds,
+            }
+
+
+class BaseSMSProvider(ABC):
+    name = "base"
+
+    def __init__(self, options: dict = None):
+        self.options = dict(settings.SMS_PROVIDER_OPTIONS, **(options or {}))
+        self.breaker = CircuitBreaker(
+            failure_rate_threshold=self.options["FAILURE_RATE_THRESHOLD"],
+            min_calls=self.options["MIN_CALLS"],
+            window=self.options["WINDOW"],
+            open_seconds=self.options["OPEN_SECONDS"],
+        )
+        self.metrics = ProviderMetrics()
+
+    def send_otp(self, phone: str, code: str) -> bool:
+        if not self.breaker.allow():
+            self.metrics.reject()
+            return False
+
+        start = time.perf_counter()
+        try:
+            is_sent = self.deliver(phone, code)
+        except Exception:
+            logger.exception("SMS provider %s failed", self.name)
+            is_sent = False
+
+        elapsed = time.perf_counter() - start
+        self.metrics.record(elapsed, is_sent)
+        record_sms(elapsed)
+        self.breaker.record(is_sent)
+        return is_sent
+
+    @abstractmethod
+    def deliver(self, phone: str, code: str) -> bool:
+        pass
+
+
+class KavenegarProvider(BaseSMSProvider):
+    name = "kavenegar"
+    url = "https://api.kavenegar.com/v1/{api_key}/verify/lookup.json"
+
+    def __init__(self, options: dict = None):
+        super().__init__(options)
+        self.api_key = os.environ.get("API_KEY")
+        self.timeout = (self.options["CONNECT_TIMEOUT"], self.options["READ_TIMEOUT"])
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.options["POOL_SIZE"],
+        )
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/json",
+                "Content-Type": "application/x-www-form-urlencoded",
+                "charset": "utf-8",
+            }
+        )
+
+    def deliver(self, phone: str, code: str) -> bool:
+        params = {
+            "receptor": f"{phone}",
+            "template": "login",
+            "token": f"{code}",
+            "type": "sms",
+        }
+        try:
+            response = self.session.post(
+                self.url.format(api_key=self.api_key),
+                data=params,
+                timeout=self.timeout,
+            )
+            result = response.json()
+        except (requests.RequestException, ValueError):
+            return False
+        return result.get("return", {}).get("status") == 200
+
+
+class FakeSMSProvider(BaseSMSProvider):
+    name = "fake"
+    outbox_size = 1000
+
+    def __init__(self, options: dict = None):
+        super().__init__(options)
+        self.outbox = deque(maxlen=self.outbox_size)
+
+    def deliver(self, phone: str, code: str) -> bool:
+        self.outbox.append({"phone": phone, "code": code})
+        return True
+
+
+@lru_cache(maxsize=None)
+def get_sms_provider(path: str = None) -> BaseSMSProvider:
+    return import_string(path or settings.SMS_PROVIDER)()
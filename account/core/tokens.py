@@ -1,11 +1,18 @@
 import datetime
-from typing import Tuple
+import time
+from typing import List, Optional, Tuple
 from uuid import uuid4
 
 import jwt
 from django.conf import settings
 from django.core.cache import caches
 
+from account.core.general import get_ip_from_request
+from account.core.keyring import HMAC_ALGORITHM, get_keyring
+from account.core.revocations import revocation_list
+from account.core.sessions import session_store
+from achareh.custom_cache import CachePipeline
+
 
 def create_login_token(request, user) -> Tuple[str, str]:
     access_token, refresh_token, jti = generate_tokens(user)
@@ -13,6 +20,21 @@ def create_login_token(request, user) -> Tuple[str, str]:
     return access_token, refresh_token
 
 
+def rotate_login_token(request, user, old_jti: str) -> Optional[Tuple[str, str]]:
+    access_token, refresh_token, jti = generate_tokens(user)
+    value = cache_value_setter(request)
+    if not session_store.rotate(user.id, old_jti, jti, value):
+        return None
+    revoke_stateless_tokens(old_jti)
+    return access_token, refresh_token
+
+
+def revoke_stateless_tokens(*jtis: str) -> None:
+    # with stateless access tokens off every token is checked against its session
+    if settings.STATELESS_ACCESS_TOKENS["ENABLED"]:
+        revocation_list.revoke(*jtis)
+
+
 def generate_tokens(user) -> Tuple[str, ...]:
     jti = jti_maker()
     access_token = generate_access_token(user.id, jti)
@@ -29,7 +51,7 @@ def generate_access_token(user_id: int, jti: str) -> str:
         "token_type": "access",
         "user_id": user_id,
         "exp": datetime.datetime.utcnow()
-        + datetime.timedelta(seconds=settings.ACCESS_TOKEN_TTL),
+        + datetime.timedelta(seconds=get_access_token_ttl()),
         "iat": datetime.datetime.utcnow(),
         "jti": jti,
     }
@@ -37,6 +59,20 @@ def generate_access_token(user_id: int, jti: str) -> str:
     return access_token
 
 
+def get_access_token_ttl() -> int:
+    if settings.STATELESS_ACCESS_TOKENS["ENABLED"]:
+        return settings.STATELESS_ACCESS_TOKENS["TTL"]
+    return settings.ACCESS_TOKEN_TTL
+
+
+def is_stateless_access_token(payload: dict) -> bool:
+    # tokens issued before the mode was turned on live longer and keep using sessions
+    return (
+        settings.STATELESS_ACCESS_TOKENS["ENABLED"]
+        and payload["exp"] - payload["iat"] <= settings.STATELESS_ACCESS_TOKENS["TTL"]
+    )
+
+
 def generate_refresh_token(user_id: int, jti: str) -> str:
     refresh_token_payload = {
         "token_type": "refresh",
@@ -64,12 +100,30 @@ def generate_work_flow_token(user_id: int, jti: str) -> str:
 
 
 def decode_jwt(token: str) -> dict:
-    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    kid = jwt.get_unverified_header(token).get("kid")
+    keyring = get_keyring()
+    if kid is None or keyring is None:
+        # tokens signed with the django secret before the keyring was enabled
+        if keyring is not None and not settings.JWT_SIGNING["HMAC_FALLBACK"]:
+            raise jwt.InvalidTokenError("Token has no kid")
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[HMAC_ALGORITHM])
+
+    key = keyring.verification_key(kid)
+    payload = jwt.decode(token, key.key, algorithms=[key.algorithm])
     return payload
 
 
 def encode_jwt(payload: dict) -> str:
-    token = jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
+    keyring = get_keyring()
+    if keyring is None:
+        return jwt.encode(payload, settings.SECRET_KEY, algorithm=HMAC_ALGORITHM)
+
+    token = jwt.encode(
+        payload,
+        keyring.signing_key,
+        algorithm=keyring.algorithm,
+        headers={"kid": keyring.active_kid},
+    )
     return token
 
 
@@ -78,17 +132,20 @@ def cache_key_parser(arg: str):
 
 
 def save_token_inside_cache(request, user, jti: str) -> None:
-    key = cache_key_setter(user.id, jti)
     value = cache_value_setter(request)
-    caches["auth"].set(key, value)
+    session_store.save(user.id, jti, value)
 
 
 def cache_key_setter(user_id: int, jti: str) -> str:
-    return f"user_{user_id} || {jti}"
+    return session_store.session_key(user_id, jti)
 
 
-def cache_value_setter(request) -> str:
-    return request.META.get("HTTP_USER_AGENT", "UNKNOWN")
+def cache_value_setter(request) -> dict:
+    return {
+        "user_agent": request.META.get("HTTP_USER_AGENT", "UNKNOWN"),
+        "ip": get_ip_from_request(request),
+        "created_at": int(time.time()),
+    }
 
 
 def check_if_work_flow_token_exists(phone):
@@ -101,7 +158,12 @@ def create_work_flow_token(user_id: int) -> Tuple[str, str]:
     return work_flow_token, jti
 
 
-def save_work_flow_token_in_cache(phone: str, token: str) -> None:
+def save_work_flow_token_in_cache(
+    phone: str, token: str, pipe: CachePipeline = None
+) -> None:
+    if pipe is not None:
+        pipe.set("work_flow", phone, token, settings.REDIS_WORK_FLOW_TTL)
+        return
     caches["work_flow"].set(phone, token, settings.REDIS_WORK_FLOW_TTL)
 
 
@@ -109,5 +171,14 @@ def delete_work_flow_token(phone: str) -> None:
     caches["work_flow"].delete(phone)
 
 
-def delete_all_sessions(user_id: int) -> None:
-    caches["auth"].delete_many(caches["auth"].keys(f"user_{user_id} || *"))
+def delete_session(user_id: int, jti: str) -> bool:
+    is_deleted = session_store.delete(user_id, jti)
+    if is_deleted:
+        revoke_stateless_tokens(jti)
+    return is_deleted
+
+
+def delete_all_sessions(user_id: int) -> List[str]:
+    jtis = session_store.delete_all(user_id)
+    revoke_stateless_tokens(*jtis)
+    return jtis
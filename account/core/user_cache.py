@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django_redis import get_redis_connection
+
+from account.models import User
+
+CACHED_FIELDS = (
+    "id",
+    "phone",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+)
+
+
+class UserCache:
+    def __init__(self, alias: str = "default"):
+        self.alias = alias
+        self._local = {}
+        self._lock = threading.Lock()
+        self.counters = {"local_hit": 0, "shared_hit": 0, "miss": 0}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def config(self) -> dict:
+        return settings.USER_CACHE
+
+    @staticmethod
+    def cache_key(user_id: int) -> str:
+        return f"auth_user_{user_id}"
+
+    @staticmethod
+    def generation_key(user_id: int) -> str:
+        return f"auth_user_generation_{user_id}"
+
+    def get(self, user_id: int) -> Optional[User]:
+        if not user_id:
+            return None
+
+        data = self._get_local(user_id)
+        if data is not None:
+            self._count("local_hit")
+            return self.deserialize(data)
+
+        # entries carry the generation they were loaded under, invalidate() bumps it so
+        # a database read that raced with an update can not bring the old row back
+        key, generation_key = self.cache_key(user_id), self.generation_key(user_id)
+        values = self.cache.get_many([key, generation_key])
+        generation = values.get(generation_key, 0)
+        data = values.get(key)
+        if data is not None and data.get("generation") == generation:
+            self._count("shared_hit")
+            self._set_local(user_id, data)
+            return self.deserialize(data)
+
+        self._count("miss")
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            return None
+
+        data = dict(self.serialize(user), generation=generation)
+        self.cache.set(key, data, self.config["SHARED_TTL"])
+        self._set_local(user_id, data)
+        return user
+
+    def invalidate(self, *user_ids: int) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._local.pop(user_id, None)
+        if not user_ids:
+            return
+
+        pipe = get_redis_connection(self.alias).pipeline()
+        for user_id in user_ids:
+            generation_key = self.cache.make_key(self.generation_key(user_id))
+            pipe.incr(generation_key)
+            # outlives any entry written under the previous generation
+            pipe.expire(generation_key, 2 * self.config["SHARED_TTL"])
+        pipe.delete(
+            *(self.cache.make_key(self.cache_key(user_id)) for user_id in user_ids)
+        )
+        pipe.execute()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, local_size=len(self._local))
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _get_local(self, user_id: int) -> Optional[dict]:
+        with self._lock:
+            item = self._local.get(user_id)
+            if item is None:
+                return None
+            expires_at, data = item
+            if expires_at < time.monotonic():
+                del self._local[user_id]
+                return None
+            return data
+
+    def _set_local(self, user_id: int, data: dict) -> None:
+        with self._lock:
+            if len(self._local) >= self.config["LOCAL_MAX_SIZE"]:
+                self._local.pop(next(iter(self._local)))
+            self._local[user_id] = (time.monotonic() + self.config["LOCAL_TTL"], data)
+
+    # password hashes and profile fields stay in the database, the other fields are
+    # deferred and load on access
+    @staticmethod
+    def serialize(user: User) -> dict:
+        return {
+            User._meta.get_field(name).attname: getattr(user, name)
+            for name in CACHED_FIELDS
+        }
+
+    @staticmethod
+    def deserialize(data: dict) -> User:
+        fields = [
+            field for field in User._meta.concrete_fields if field.name in CACHED_FIELDS
+        ]
+        return User.from_db(
+            router.db_for_read(User),
+            [field.attname for field in fields],
+            [field.to_python(data.get(field.attname)) for field in fields],
+        )
+
+
+user_cache = UserCache()
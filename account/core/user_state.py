@@ -0,0 +1,49 @@
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from account.models import User
+
+
+class UserStateCache:
+    def __init__(self, alias: str = "default"):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def cache_key(phone: str) -> str:
+        return f"user_state_{phone}"
+
+    def get(self, phone: str) -> Optional[dict]:
+        state = self.cache.get(self.cache_key(phone))
+        if state is None:
+            state = self.load(phone)
+            self.cache.set(self.cache_key(phone), state, settings.USER_STATE_TTL)
+        # an empty state marks a phone that has no user yet
+        return state or None
+
+    @staticmethod
+    def load(phone: str) -> dict:
+        user = (
+            User.default_objects.filter(phone=phone)
+            .values("id", "is_active", "password", "is_deleted")
+            .first()
+        )
+        if not user:
+            return {}
+        return {
+            "id": user["id"],
+            "is_active": user["is_active"],
+            "has_password": bool(user["password"]),
+            "is_deleted": user["is_deleted"],
+        }
+
+    def invalidate(self, *phones: str) -> None:
+        self.cache.delete_many([self.cache_key(phone) for phone in phones])
+
+
+user_state_cache = UserStateCache()
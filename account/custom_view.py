@@ -3,18 +3,23 @@ from abc import ABC
 from rest_framework.views import APIView
 
 from account.core.general import get_ip_from_request
-from account.utils import check_if_request_is_throttled
+from account.utils import check_if_request_is_throttled, flush_throttle_records
 
 
 class CustomAPIView(ABC, APIView):
     def initial(self, request, *args, **kwargs):
         ip = get_ip_from_request(request)
 
+        phones = [None]
         if phone := request.data.get("phone", f"{ip}_NONE"):
-            check_if_request_is_throttled(request, self, phone=phone)
+            phones.insert(0, phone)
 
-        check_if_request_is_throttled(request, self)
+        check_if_request_is_throttled(request, self, *phones)
         super().initial(request, *args, **kwargs)
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        flush_throttle_records(request, self)
+        return super().finalize_response(request, response, *args, **kwargs)
+
     def get_serializer_context(self):
         return {"request": self.request, "format": self.format_kwarg, "view": self}
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from account.core.sessions import session_store
+from account.core.tokens import cache_key_parser
+
+
+class Command(BaseCommand):
+    help = "Index sessions that were saved before the per-user session index existed"
+
+    def handle(self, *args, **options):
+        count = 0
+        for key in session_store.cache.iter_keys("user_* || *"):
+            user_part, jti = cache_key_parser(key)
+            session_store.add_to_index(int(user_part.removeprefix("user_")), jti)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} sessions indexed"))
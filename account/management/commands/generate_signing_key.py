@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Write a new token signing key to the JWT keys directory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kid")
+        parser.add_argument(
+            "--algorithm",
+            choices=("EdDSA", "RS256"),
+            default=settings.JWT_SIGNING["ALGORITHM"],
+        )
+
+    def handle(self, *args, **options):
+        if options["algorithm"] == "EdDSA":
+            key = ed25519.Ed25519PrivateKey.generate()
+        elif options["algorithm"] == "RS256":
+            key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        else:
+            raise CommandError("Choose EdDSA or RS256 with --algorithm")
+
+        directory = Path(settings.JWT_SIGNING["KEYS_DIR"])
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{options["kid"]}.pem'
+        if path.exists():
+            raise CommandError(f"{path} already exists")
+
+        path.write_bytes(
+            key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption(),
+            )
+        )
+        path.chmod(0o600)
+        self.stdout.write(self.style.SUCCESS(f"Signing key written to {path}"))
@@ -0,0 +1,27 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from account.core.otp_worker import OTPWorker
+
+
+class Command(BaseCommand):
+    help = "Deliver queued OTP messages through the configured SMS provider"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.OTP_OUTBOX["CONCURRENCY"],
+            help="Maximum number of SMS provider calls in flight",
+        )
+
+    def handle(self, *args, **options):
+        worker = OTPWorker(concurrency=options["concurrency"])
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+
+        self.stdout.write(f"OTP worker {worker.consumer} started")
+        worker.run()
+        self.stdout.write(f"OTP worker {worker.consumer} stopped")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account.core.phone_filter import known_phones_filter
+from account.models import User
+
+
+class Command(BaseCommand):
+    help = "Rebuild the known phones bloom filter from the users table"
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        phones = User.default_objects.values_list("phone", flat=True)
+        count = known_phones_filter.rebuild(phones.iterator(chunk_size=5000))
+
+        # users created while the rebuild ran were added to the replaced filter
+        known_phones_filter.add(
+            *User.default_objects.filter(date_joined__gte=started_at).values_list(
+                "phone", flat=True
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(f"{count} phones added to the filter"))
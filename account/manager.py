@@ -1,9 +1,40 @@
+from collections import Counter
+
 from django.contrib.admin.utils import NestedObjects
 from django.contrib.auth.models import BaseUserManager
-from django.db.models import Manager, Q
+from django.db import transaction
+from django.db.models import Manager
 from django.db.models.query import QuerySet
+from django.dispatch import Signal
 from django.utils import timezone
 
+# sent once per model with the instances a soft delete has just flagged, since the
+# bulk UPDATE behind it does not send post_save
+soft_deleted = Signal()
+
+
+def soft_delete_collected(collector, using):
+    deleted_at = timezone.now()
+    deleted_counter = Counter()
+
+    with transaction.atomic(using=using, savepoint=False):
+        for model, instances in collector.data.items():
+            pks = [obj.pk for obj in instances]
+            queryset = model._base_manager.using(using).filter(pk__in=pks)
+
+            if hasattr(model, "is_deleted"):
+                count = queryset.update(is_deleted=True, deleted_at=deleted_at)
+                for obj in instances:
+                    obj.is_deleted = True
+                    obj.deleted_at = deleted_at
+                soft_deleted.send(sender=model, instances=instances, using=using)
+            else:
+                count, _ = queryset.delete()
+
+            deleted_counter[model._meta.label] += count
+
+    return sum(deleted_counter.values()), dict(deleted_counter)
+
 
 class SoftQuerySet(QuerySet):
 
@@ -26,28 +57,15 @@ class SoftQuerySet(QuerySet):
 
         collector = NestedObjects(using=del_query.db, origin=self)
         collector.collect(del_query)
-
-        to_update = collector.nested()
-        # TODO need to double check if works properly
-        # TODO performance check is needed
-        # TODO many to many needs to be checked
-
-        for obj in to_update:
-            if hasattr(obj.__class__, "is_deleted"):
-                obj.is_deleted = True
-                obj.deleted_at = timezone.now()
-                obj.save(update_fields=["is_deleted", "deleted_at"])
-            else:
-                obj.delete()
+        deleted = soft_delete_collected(collector, del_query.db)
 
         self._result_cache = None
+        return deleted
 
 
 class SoftDeleteManager(Manager):
     def get_queryset(self):
-        return SoftQuerySet(self.model, self._db).filter(
-            Q(is_deleted=False) | Q(is_deleted__isnull=True)
-        )
+        return SoftQuerySet(self.model, self._db).filter(is_deleted=False)
 
 
 class CustomManager(SoftDeleteManager, BaseUserManager):
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-18 09:56
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("account", "0007_alter_user_phone"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="is_deleted",
+            field=models.BooleanField(default=False),
+        ),
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_deleted", True)),
+                fields=["deleted_at"],
+                name="account_user_deleted_at_idx",
+            ),
+        ),
+    ]
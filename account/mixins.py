@@ -1,6 +1,6 @@
 from account.core.check_user_phone import generate_otp_and_send, save_otp_inside_cache
 from account.core.general import get_ip_from_request
-from account.utils import add_request_to_throttle
+from account.utils import add_request_to_throttle, release_request_from_throttle
 
 
 class IsValidMixin:
@@ -10,29 +10,18 @@ class IsValidMixin:
         phone = self.initial_data.get("phone")
         ip = get_ip_from_request(request)
 
-        if phone:
-            add_request_to_throttle(
-                request,
-                view,
-                phone,
-            )
-        else:
-            add_request_to_throttle(
-                request,
-                view,
-                f"{ip}_NONE",
-            )
-
-        add_request_to_throttle(self.context.get("request"), self.context.get("view"))
+        add_request_to_throttle(request, view, phone or f"{ip}_NONE", None)
         super().is_valid(raise_exception=raise_exception)
 
 
 class SendOTPMixin:
     def send_otp(self, phone, request, throttle_trigger=True):
+        if throttle_trigger:
+            add_request_to_throttle(request, self, None, phone)
+
         sms_provider_result, code = generate_otp_and_send(phone)
         if sms_provider_result:
             save_otp_inside_cache(phone, code)
-            if throttle_trigger:
-                add_request_to_throttle(request, self)
-                add_request_to_throttle(request, self, phone)
+        elif throttle_trigger:
+            release_request_from_throttle(request, self, None, phone)
         return sms_provider_result
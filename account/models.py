@@ -2,15 +2,14 @@ from django.contrib.admin.utils import NestedObjects
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.db import models, router
-from django.utils import timezone
 
-from account.manager import CustomManager, SoftDeleteManager
+from account.manager import CustomManager, SoftDeleteManager, soft_delete_collected
 from account.utils import phone_number_regex
 
 
 # Create your models here.
 class SoftDeleteBaseModel(models.Model):
-    is_deleted = models.BooleanField(default=False, db_index=True)
+    is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     objects = SoftDeleteManager()
@@ -29,17 +28,7 @@ class SoftDeleteBaseModel(models.Model):
         using = using or router.db_for_write(self.__class__, instance=self)
         collector = NestedObjects(using=using, origin=self)
         collector.collect([self], keep_parents=keep_parents)
-        to_update = collector.nested()
-        # TODO need to double check if works properly
-        # TODO performance check is needed
-        # TODO many to many needs to be checked
-        for obj in to_update:
-            if hasattr(obj.__class__, "is_deleted"):
-                obj.is_deleted = True
-                obj.deleted_at = timezone.now()
-                obj.save(update_fields=["is_deleted", "deleted_at"])
-            else:
-                obj.delete()
+        return soft_delete_collected(collector, using)
 
 
 class User(AbstractUser, SoftDeleteBaseModel):
@@ -53,6 +42,22 @@ class User(AbstractUser, SoftDeleteBaseModel):
 
     objects = CustomManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the stored phone, so a phone change also drops the old phone's cached state
+        instance.loaded_phone = instance.__dict__.get("phone")
+        return instance
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(is_deleted=True),
+                name="account_user_deleted_at_idx",
+            ),
+        ]
+
 
 class RecycleUser(User):
     deleted_object = BaseUserManager()
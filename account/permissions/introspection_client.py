@@ -0,0 +1,15 @@
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class IsIntrospectionClient(BasePermission):
+    message = "Permission denied, unknown introspection client."
+
+    def has_permission(self, request, view):
+        key = request.headers.get("X-Introspection-Key", "").encode()
+        return any(
+            hmac.compare_digest(key, client_key.encode())
+            for client_key in settings.INTROSPECTION["CLIENT_KEYS"]
+        )
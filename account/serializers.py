@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 
+from account.core.hashing import hash_password
 from account.core.tokens import delete_work_flow_token
+from account.core.user_state import user_state_cache
 from account.mixins import IsValidMixin
 from account.models import User
+from account.signals import invalidate_users_on_commit
 from account.utils import JTI_REGEX, PHONE_REGEX
 
 
@@ -40,16 +44,12 @@ class UserRegisterSerializer(IsValidMixin, PhoneSerializer):
     )
 
     def validate_phone(self, value):
-        user = (
-            User.default_objects.filter(phone=value)
-            .values("is_deleted", "is_active", "password")
-            .first()
-        )
+        user = user_state_cache.get(value)
         if user and user.get("is_deleted"):
             raise serializers.ValidationError("Deleted Account!")
-        elif user and user.get("password") and not user.get("is_active"):
+        elif user and user.get("has_password") and not user.get("is_active"):
             raise serializers.ValidationError("Your Account Is Not Active Exists!")
-        elif user and user.get("password") and user.get("is_active"):
+        elif user and user.get("has_password") and user.get("is_active"):
             raise serializers.ValidationError("Account Already Exists!")
 
         return value
@@ -94,9 +94,11 @@ class UserUpdateSerializer(PasswordSerializer, serializers.ModelSerializer):
         return value.strip()
 
     def update(self, instance, validated_data):
+        instance.password = hash_password(validated_data.pop("password"))
         instance = super().update(instance, validated_data)
         instance.is_active = True
         instance.save()
+        invalidate_users_on_commit(instance)
         # here a celery task can be run to delete work flow token in order to invoke it
         delete_work_flow_token(instance.id)
         return instance
@@ -108,3 +110,11 @@ class UserLoginSerializer(IsValidMixin, PhoneSerializer, PasswordSerializer):
 
 class JTISerializer(serializers.Serializer):
     jti = serializers.RegexField(regex=JTI_REGEX)
+
+
+class IntrospectionSerializer(serializers.Serializer):
+    tokens = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=settings.INTROSPECTION["MAX_TOKENS"],
+    )
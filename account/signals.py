@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from account.core.phone_filter import known_phones_filter
+from account.core.user_cache import user_cache
+from account.core.user_state import user_state_cache
+from account.manager import soft_deleted
+from account.models import User
+
+
+def invalidate_users_on_commit(*users: User) -> None:
+    user_ids = [user.pk for user in users]
+    phones = {user.phone for user in users}
+    for user in users:
+        loaded_phone = getattr(user, "loaded_phone", None)
+        if loaded_phone:
+            phones.add(loaded_phone)
+        user.loaded_phone = user.phone
+
+    def invalidate():
+        user_cache.invalidate(*user_ids)
+        user_state_cache.invalidate(*phones)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save)
+def invalidate_saved_user(sender, instance, created, **kwargs):
+    if isinstance(instance, User):
+        # compared before invalidate_users_on_commit moves loaded_phone to the new phone
+        if created or instance.phone != getattr(instance, "loaded_phone", None):
+            add_known_phone_on_commit(instance.phone)
+        invalidate_users_on_commit(instance)
+
+
+@receiver(post_delete)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    if isinstance(instance, User):
+        invalidate_users_on_commit(instance)
+
+
+@receiver(soft_deleted)
+def invalidate_soft_deleted_users(sender, instances, **kwargs):
+    if issubclass(sender, User):
+        invalidate_users_on_commit(*instances)
+
+
+def add_known_phone_on_commit(phone: str) -> None:
+    if known_phones_filter.is_enabled:
+        transaction.on_commit(lambda: known_phones_filter.add(phone))
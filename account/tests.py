@@ -1,19 +1,68 @@
+import json
 import os
+import tempfile
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
 
-from django.test import TestCase
+import jwt
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
 
 # Create your tests here.
 
 from django.urls import reverse
+from django_redis import get_redis_connection
 from rest_framework import status
 from rest_framework.test import APITestCase
 from unittest.mock import patch
 
+from achareh.custom_cache import CachePipeline, shares_pool
+from achareh.custom_serializer import CompactSerializer, ThresholdZlibCompressor
+from achareh.custom_throttle import CustomScopedRateThrottle
 
+from .core.hashing import hashing_executor
+from .core.otp_outbox import otp_outbox
+from .core.last_seen import LastSeenTracker
+from .core.phone_filter import known_phones_filter
+from .core.revocations import RevocationList, revocation_list
+from .core.otp_worker import OTPWorker
+from .core.sessions import session_store
+from .core.sms_providers import FakeSMSProvider
+from .core.tokens import create_login_token, decode_jwt, encode_jwt
+from .core.user_cache import user_cache
+from .core.user_state import user_state_cache
 from .enums.fault_code import FaultCode
 from .enums.user_state import UserSituation
 from .models import User
 
+# tests write under their own key prefix and clear only those keys, so running them
+# against a redis that is shared with other data (REDIS_SHARED_POOL) is safe
+TEST_CACHES = {
+    alias: dict(
+        config, KEY_PREFIX="_".join(filter(None, ["test", config.get("KEY_PREFIX")]))
+    )
+    for alias, config in settings.CACHES.items()
+}
+test_caches = override_settings(CACHES=TEST_CACHES)
+
+
+def setUpModule():
+    test_caches.enable()
+
+
+def tearDownModule():
+    clear_test_keys(*TEST_CACHES)
+    test_caches.disable()
+
+
+def clear_test_keys(*aliases):
+    for alias in aliases:
+        caches[alias].delete_pattern("*")
+
 
 class CheckUserPhoneTests(APITestCase):
     # @classmethod
@@ -22,6 +71,7 @@ class CheckUserPhoneTests(APITestCase):
     #     super().setUpClass()
 
     def setUp(self):
+        clear_test_keys("default")
         self.url = reverse("account:check_phone")
         self.valid_phone = "09117200513"
         self.deleted_user = User.objects.create(
@@ -91,3 +141,618 @@ class CheckUserPhoneTests(APITestCase):
         self.assertEqual(
             response.data["message"][0], FaultCode.SMS_PROVIDER_FAILURE.value
         )
+
+
+class SessionTests(APITestCase):
+    def setUp(self):
+        clear_test_keys("auth")
+        self.user = User.objects.create(phone="09121234567", is_active=True)
+        self.user.set_password("some_password")
+        self.user.save()
+
+    def login(self):
+        access_token, refresh_token = create_login_token(
+            RequestFactory().get("/"), self.user
+        )
+        return access_token, refresh_token
+
+    def test_logout_invalidates_session(self):
+        access_token, refresh_token = self.login()
+        jti = decode_jwt(refresh_token)["jti"]
+        self.assertTrue(session_store.exists(self.user.id, jti))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {refresh_token}")
+        response = self.client.get(reverse("account:logout"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(session_store.exists(self.user.id, jti))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {access_token}")
+        response = self.client.get(reverse("account:active_login"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_selected_logout_unknown_session(self):
+        access_token, _ = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {access_token}")
+        response = self.client.post(
+            reverse("account:selected_logout"), {"jti": "0" * 32}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["message"], UserSituation.INVALID_SESSION.value)
+
+    def test_active_login_and_logout_all(self):
+        self.login()
+        access_token, refresh_token = self.login()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {access_token}")
+        response = self.client.get(reverse("account:active_login"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {refresh_token}")
+        with patch.object(revocation_list, "revoke") as mock_revoke:
+            response = self.client.get(reverse("account:logout_all"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(session_store.get_all(self.user.id), {})
+        mock_revoke.assert_not_called()
+
+    def test_active_login_shows_metadata_and_last_seen(self):
+        access_token, _ = self.login()
+        jti = decode_jwt(access_token)["jti"]
+        session_store.save(self.user.id, "0" * 32, "Legacy-UA")
+
+        tracker = LastSeenTracker(session_store)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {access_token}")
+        with patch("account.authentication.last_seen_tracker", tracker), patch.object(
+            tracker, "ensure_worker"
+        ):
+            self.client.get(reverse("account:active_login"))
+            self.assertEqual(tracker.flush(), 1)
+            response = self.client.get(reverse("account:active_login"))
+
+        sessions = {session["jti"]: session for session in response.data}
+        self.assertEqual(sessions["0" * 32]["user_agent"], "Legacy-UA")
+        self.assertEqual(sessions[jti]["ip"], "127.0.0.1")
+        self.assertEqual(
+            sessions[jti]["last_seen"], session_store.get_last_seen(self.user.id)[jti]
+        )
+
+    def test_flush_after_logout_does_not_restore_the_session(self):
+        access_token, _ = self.login()
+        jti = decode_jwt(access_token)["jti"]
+
+        tracker = LastSeenTracker(session_store)
+        with patch.object(tracker, "ensure_worker"):
+            tracker.touch(self.user.id, jti)
+        session_store.delete(self.user.id, jti)
+        tracker.flush()
+
+        self.assertNotIn(jti, session_store.get_last_seen(self.user.id))
+
+    def test_refresh_rotates_session_once(self):
+        _, refresh_token = self.login()
+        old_jti = decode_jwt(refresh_token)["jti"]
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {refresh_token}")
+        response = self.client.post(reverse("account:token_refresh"))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_jti = decode_jwt(response.data["refresh"])["jti"]
+        self.assertEqual(list(session_store.get_all(self.user.id)), [new_jti])
+
+        # the losing side of a concurrent refresh with the same token
+        self.assertFalse(session_store.rotate(self.user.id, old_jti, "0" * 32, "UA"))
+        self.assertEqual(list(session_store.get_all(self.user.id)), [new_jti])
+
+    @override_settings(
+        STATELESS_ACCESS_TOKENS=dict(settings.STATELESS_ACCESS_TOKENS, ENABLED=True)
+    )
+    def test_stateless_access_token_is_revoked_on_logout(self):
+        access_token, refresh_token = self.login()
+        jti = decode_jwt(access_token)["jti"]
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {access_token}")
+        with patch.object(session_store, "exists") as mock_exists:
+            response = self.client.get(reverse("account:active_login"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_exists.assert_not_called()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {refresh_token}")
+        response = self.client.get(reverse("account:logout"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(RevocationList().is_revoked(jti))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {access_token}")
+        response = self.client.get(reverse("account:active_login"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(INTROSPECTION=dict(settings.INTROSPECTION, CLIENT_KEYS=["gw"]))
+class IntrospectionTests(APITestCase):
+    def setUp(self):
+        clear_test_keys("auth")
+        self.url = reverse("account:introspect")
+        self.user = User.objects.create(phone="09121234574", is_active=True)
+        self.inactive_user = User.objects.create(phone="09121234575")
+
+    def login(self, user):
+        return create_login_token(RequestFactory().get("/"), user)[0]
+
+    def test_batch_results(self):
+        active_token = self.login(self.user)
+        revoked_token = self.login(self.user)
+        session_store.delete(self.user.id, decode_jwt(revoked_token)["jti"])
+        inactive_token = self.login(self.inactive_user)
+        tokens = [active_token, revoked_token, inactive_token, "not-a-token"]
+
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                self.url,
+                {"tokens": tokens},
+                format="json",
+                HTTP_X_INTROSPECTION_KEY="gw",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertTrue(results[0]["active"])
+        self.assertEqual(results[0]["user_id"], self.user.id)
+        self.assertEqual(
+            [result.get("error") for result in results[1:]],
+            ["revoked", "inactive_user", "invalid"],
+        )
+
+    def test_requires_client_key(self):
+        response = self.client.post(
+            self.url, {"tokens": ["x"]}, format="json", HTTP_X_INTROSPECTION_KEY="no"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ForwardAuthTests(APITestCase):
+    def setUp(self):
+        clear_test_keys("auth")
+        self.url = reverse("account:verify")
+        self.user = User.objects.create(phone="09121234576", is_active=True)
+
+    def test_verify_sets_identity_headers(self):
+        access_token, _ = create_login_token(RequestFactory().get("/"), self.user)
+
+        with self.assertNoLogs("elastic_logger", "INFO"):
+            response = self.client.get(
+                self.url, HTTP_AUTHORIZATION=f"Token {access_token}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response["X-User-Id"], str(self.user.id))
+        self.assertEqual(response["X-Token-Jti"], decode_jwt(access_token)["jti"])
+
+    def test_verify_rejects_missing_or_invalid_token(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION="Token not-a-token")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class KeyringTests(APITestCase):
+    def setUp(self):
+        keys_dir = tempfile.mkdtemp()
+        self.signing = dict(
+            settings.JWT_SIGNING,
+            ALGORITHM="EdDSA",
+            KEYS_DIR=keys_dir,
+            ACTIVE_KID="key_1",
+        )
+        with override_settings(JWT_SIGNING=self.signing):
+            call_command("generate_signing_key", "key_1", stdout=StringIO())
+        self.user = User.objects.create(phone="09121234573", is_active=True)
+
+    def test_tokens_verify_with_published_keys(self):
+        legacy_token = encode_jwt({"user_id": self.user.id})
+
+        with override_settings(JWT_SIGNING=self.signing):
+            access_token, _ = create_login_token(RequestFactory().get("/"), self.user)
+            response = self.client.get(reverse("account:jwks"))
+
+            self.assertEqual(decode_jwt(legacy_token)["user_id"], self.user.id)
+
+        self.assertEqual(jwt.get_unverified_header(access_token)["kid"], "key_1")
+        self.assertIn("max-age", response.headers["Cache-Control"])
+        (jwk,) = response.json()["keys"]
+        payload = jwt.decode(access_token, jwt.PyJWK(jwk).key, algorithms=[jwk["alg"]])
+        self.assertEqual(payload["user_id"], self.user.id)
+
+    def test_rotation_to_another_key_type(self):
+        with override_settings(JWT_SIGNING=self.signing):
+            old_token = encode_jwt({"user_id": self.user.id})
+
+        rotated = dict(self.signing, ALGORITHM="RS256", ACTIVE_KID="key_2")
+        with override_settings(JWT_SIGNING=rotated):
+            call_command(
+                "generate_signing_key", "key_2", algorithm="RS256", stdout=StringIO()
+            )
+            new_token = encode_jwt({"user_id": self.user.id})
+            response = self.client.get(reverse("account:jwks"))
+
+            self.assertEqual(decode_jwt(old_token)["user_id"], self.user.id)
+            self.assertEqual(decode_jwt(new_token)["user_id"], self.user.id)
+
+        self.assertEqual(
+            {jwk["kid"]: jwk["alg"] for jwk in response.json()["keys"]},
+            {"key_1": "EdDSA", "key_2": "RS256"},
+        )
+
+    def test_hmac_fallback_can_be_turned_off(self):
+        legacy_token = encode_jwt({"user_id": self.user.id})
+
+        with override_settings(JWT_SIGNING=dict(self.signing, HMAC_FALLBACK=False)):
+            with self.assertRaises(jwt.InvalidTokenError):
+                decode_jwt(legacy_token)
+
+
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        self.url = reverse("account:check_phone")
+        clear_test_keys("throttle")
+
+    def tearDown(self):
+        clear_test_keys("throttle")
+
+    @patch("account.mixins.generate_otp_and_send")
+    def test_check_phone_is_throttled(self, mock_generate_otp_and_send):
+        mock_generate_otp_and_send.return_value = (True, "123456")
+        data = {"phone": "09333696798"}
+        for _ in range(5):
+            response = self.client.post(self.url, data)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(mock_generate_otp_and_send.call_count, 5)
+
+    def test_unused_reservations_are_released(self):
+        User.objects.create(phone="09333696799", is_active=True, password="x")
+        for _ in range(6):
+            response = self.client.post(self.url, {"phone": "09333696799"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_window_never_records_past_the_limit(self):
+        throttle = CustomScopedRateThrottle()
+        throttle.key, throttle.duration, throttle.num_requests = "window", 60, 3
+        results = [
+            CustomScopedRateThrottle.engine.admit([throttle], 1000.0, f"hit_{i}")
+            for i in range(5)
+        ]
+
+        self.assertEqual(results, [True] * 3 + [False] * 2)
+        self.assertEqual(throttle.count, 3)
+
+
+class UserCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(phone="09121234568", is_active=True)
+        user_cache.invalidate(self.user.id)
+
+    def test_cached_user_is_invalidated_on_save(self):
+        self.assertEqual(user_cache.get(self.user.id).first_name, "")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Ali"
+            self.user.save()
+
+        self.assertEqual(user_cache.get(self.user.id).first_name, "Ali")
+
+    # only the shared tier, local entries are kept for a few seconds by design
+    @override_settings(USER_CACHE=dict(settings.USER_CACHE, LOCAL_TTL=-1))
+    def test_racing_read_does_not_restore_a_stale_row(self):
+        stale = User.objects.get(id=self.user.id)
+
+        def load_then_update(**kwargs):
+            User.objects.filter(id=self.user.id).update(first_name="Ali")
+            user_cache.invalidate(self.user.id)
+            return stale
+
+        with patch.object(User.objects, "get", side_effect=load_then_update):
+            user_cache.get(self.user.id)
+
+        self.assertEqual(user_cache.get(self.user.id).first_name, "Ali")
+
+    def test_cached_payload_has_no_password(self):
+        user_cache.get(self.user.id)
+
+        data = caches["default"].get(user_cache.cache_key(self.user.id))
+        self.assertNotIn("password", data)
+        self.assertEqual(user_cache.get(self.user.id).phone, self.user.phone)
+
+    def test_deleted_user_is_not_resolved(self):
+        user_cache.get(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertIsNone(user_cache.get(self.user.id))
+
+
+class OTPOutboxTests(APITestCase):
+    def setUp(self):
+        clear_test_keys("otp")
+        self.provider = FakeSMSProvider()
+        self.worker = OTPWorker(provider=self.provider, concurrency=2, block_ms=10)
+        self.worker.outbox.ensure_group()
+
+    def test_queued_otp_is_delivered(self):
+        self.assertTrue(otp_outbox.enqueue("09121234569", "123456"))
+
+        self.worker.run_once()
+        wait(self.worker.in_flight)
+
+        self.assertEqual(
+            list(self.provider.outbox), [{"phone": "09121234569", "code": "123456"}]
+        )
+
+    @patch.object(FakeSMSProvider, "send_otp", return_value=False)
+    def test_failed_delivery_is_retried(self, mock_send_otp):
+        otp_outbox.enqueue("09121234569", "123456")
+
+        self.worker.run_once()
+        wait(self.worker.in_flight)
+
+        retries = get_redis_connection("otp").zcard(otp_outbox.key(otp_outbox.retries))
+        self.assertEqual(retries, 1)
+
+
+class SMSProviderTests(TestCase):
+    def test_circuit_opens_after_failures(self):
+        provider = FakeSMSProvider({"MIN_CALLS": 2, "OPEN_SECONDS": 60})
+        with patch.object(provider, "deliver", return_value=False) as mock_deliver:
+            self.assertFalse(provider.send_otp("09121234569", "123456"))
+            self.assertFalse(provider.send_otp("09121234569", "123456"))
+            self.assertFalse(provider.send_otp("09121234569", "123456"))
+
+        self.assertEqual(mock_deliver.call_count, 2)
+        self.assertEqual(provider.metrics.as_dict()["rejected"], 1)
+
+
+class RequestMetricsTests(APITestCase):
+    def test_api_log_records_request_cost(self):
+        clear_test_keys("throttle")
+        User.objects.create(phone="09121234570", is_active=True, password="x")
+
+        with self.assertLogs("elastic_logger", "INFO") as logs:
+            self.client.post(reverse("account:check_phone"), {"phone": "09121234570"})
+
+        cost = json.loads(logs.records[-1].getMessage())["cost"]
+        self.assertGreater(cost["redis"]["throttle"]["count"], 0)
+        self.assertGreater(cost["sql_count"], 0)
+        self.assertGreater(cost["duration_ms"], 0)
+
+
+class APILogPolicyTests(APITestCase):
+    def setUp(self):
+        clear_test_keys("throttle")
+        User.objects.create(phone="09121234571", is_active=True, password="x")
+        self.url = reverse("account:check_phone")
+
+    @override_settings(
+        API_LOG_POLICY=dict(
+            settings.API_LOG_POLICY, SAMPLE_RATES={"account:check_phone": 0.0}
+        )
+    )
+    def test_sampled_out_route_still_logs_errors(self):
+        with self.assertNoLogs("elastic_logger", "INFO"):
+            response = self.client.post(self.url, {"phone": "09121234571"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertLogs("elastic_logger", "INFO") as logs:
+            response = self.client.post(self.url, {"phone": "123"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(logs.records[-1].getMessage())["sample_rate"], 1.0)
+
+    @override_settings(
+        API_LOG_POLICY=dict(
+            settings.API_LOG_POLICY,
+            ALWAYS_LOG=("/account/",),
+            SAMPLE_RATES={"account:check_phone": 0.0},
+        )
+    )
+    def test_always_logged_prefix_beats_a_route_rate(self):
+        with self.assertLogs("elastic_logger", "INFO") as logs:
+            response = self.client.post(self.url, {"phone": "09121234571"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(logs.records[-1].getMessage())["sample_rate"], 1.0)
+
+
+class SharedPoolTests(TestCase):
+    def test_aliases_on_one_pool_share_a_pipeline(self):
+        location = settings.CACHES["default"]["LOCATION"]
+        shared = {
+            alias: dict(config, LOCATION=location, KEY_PREFIX=f"test_{alias}")
+            for alias, config in settings.CACHES.items()
+        }
+        with override_settings(CACHES=shared):
+            self.assertTrue(shares_pool("otp", "work_flow"))
+            caches["otp"].set("09121234572", "123456")
+
+            with CachePipeline() as pipe:
+                pipe.set("work_flow", 1, "some_jti", 60)
+                pipe.delete("otp", "09121234572")
+                self.assertEqual(len(pipe._pipelines), 1)
+
+            self.assertEqual(caches["work_flow"].get(1), "some_jti")
+            self.assertIsNone(caches["otp"].get("09121234572"))
+            self.assertIsNone(caches["default"].get(1))
+            clear_test_keys("work_flow")
+
+
+class CompactSerializerTests(TestCase):
+    def test_round_trip_and_legacy_json(self):
+        serializer = CompactSerializer({})
+        for value in ("Mozilla/5.0", [1700000000.25, 1700000001.5], {"id": 1}):
+            self.assertEqual(serializer.loads(serializer.dumps(value)), value)
+
+        self.assertEqual(serializer.dumps("Mozilla/5.0"), b"\x00Mozilla/5.0")
+        self.assertEqual(serializer.dumps([1.5, 2.5]), b"\x02[1.5,2.5]")
+
+    def test_session_metadata_is_packed(self):
+        serializer = CompactSerializer({})
+        session = {
+            "user_agent": "Mozilla/5.0",
+            "ip": "127.0.0.1",
+            "created_at": 1700000000,
+        }
+        payload = serializer.dumps(session)
+
+        self.assertEqual(payload[:1], b"\x01")
+        self.assertEqual(len(payload), 1 + 5 + len("127.0.0.1") + len("Mozilla/5.0"))
+        self.assertEqual(serializer.loads(payload), session)
+        self.assertEqual(serializer.loads(json.dumps(session).encode()), session)
+        self.assertEqual(serializer.loads(b'"Mozilla/5.0"'), "Mozilla/5.0")
+        self.assertEqual(serializer.loads(b"[1.5, 2.5]"), [1.5, 2.5])
+
+    def test_reader_only_mode_writes_json(self):
+        options = {"COMPACT_WRITES": False, "COMPRESS_MIN_LENGTH": 10}
+        payload = CompactSerializer(options).dumps("Mozilla/5.0" * 10)
+        self.assertEqual(payload, b'"' + b"Mozilla/5.0" * 10 + b'"')
+        self.assertEqual(ThresholdZlibCompressor(options).compress(payload), payload)
+
+    def test_compresses_above_threshold(self):
+        compressor = ThresholdZlibCompressor({"COMPRESS_MIN_LENGTH": 10})
+        self.assertEqual(compressor.compress(b"short"), b"short")
+        payload = b"\x00" + b"Mozilla/5.0" * 10
+        compressed = compressor.compress(payload)
+        self.assertLess(len(compressed), len(payload))
+        self.assertEqual(compressor.decompress(compressed), payload)
+
+
+class SoftDeleteTests(APITestCase):
+    def test_queryset_delete_flags_all_rows_at_once(self):
+        phones = ["09120000001", "09120000002", "09120000003"]
+        for phone in phones:
+            User.objects.create(phone=phone)
+        group = Group.objects.create(name="testers")
+        User.objects.get(phone=phones[0]).groups.add(group)
+
+        User.objects.filter(phone__in=phones).delete()
+
+        self.assertFalse(User.objects.filter(phone__in=phones).exists())
+        deleted = User.default_objects.filter(phone__in=phones, is_deleted=True)
+        self.assertEqual(deleted.count(), 3)
+        self.assertEqual(len(set(deleted.values_list("deleted_at", flat=True))), 1)
+        self.assertFalse(group.user_set.exists())
+
+
+@override_settings(
+    KNOWN_PHONES_FILTER={"ENABLED": True, "SIZE_BITS": 2**16, "HASHES": 7}
+)
+class KnownPhonesFilterTests(APITestCase):
+    def setUp(self):
+        clear_test_keys("default")
+
+    def test_unbuilt_filter_rules_nothing_out(self):
+        self.assertFalse(known_phones_filter.is_unknown("09121234560"))
+
+    def test_rebuilt_filter(self):
+        known_phones_filter.rebuild(["09121234561"])
+        self.assertFalse(known_phones_filter.is_unknown("09121234561"))
+        self.assertTrue(known_phones_filter.is_unknown("09121234562"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create(phone="09121234562")
+        self.assertFalse(known_phones_filter.is_unknown("09121234562"))
+
+    def test_profile_update_does_not_touch_the_filter(self):
+        user = User.objects.create(phone="09121234564")
+        user = User.objects.get(id=user.id)
+
+        with patch.object(known_phones_filter, "add") as mock_add:
+            with self.captureOnCommitCallbacks(execute=True):
+                user.first_name = "Ali"
+                user.save()
+            mock_add.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                user.phone = "09121234565"
+                user.save()
+            mock_add.assert_called_once_with("09121234565")
+
+    def test_lost_filter_rules_nothing_out(self):
+        known_phones_filter.rebuild(["09121234561"])
+        get_redis_connection("default").delete(
+            known_phones_filter.make_key(known_phones_filter.key)
+        )
+        known_phones_filter.add("09121234561")
+
+        self.assertFalse(known_phones_filter.is_unknown("09121234562"))
+
+
+class UserStateCacheTests(APITestCase):
+    def setUp(self):
+        clear_test_keys("default")
+
+    def test_state_is_refreshed_after_registration(self):
+        phone = "09121234563"
+        self.assertIsNone(user_state_cache.get(phone))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(phone=phone)
+
+        self.assertEqual(
+            user_state_cache.get(phone),
+            {
+                "id": user.id,
+                "is_active": False,
+                "has_password": False,
+                "is_deleted": False,
+            },
+        )
+
+    def test_old_phone_is_invalidated_after_phone_change(self):
+        user = User.objects.create(phone="09121234563", is_active=True)
+        user = User.objects.get(id=user.id)
+        self.assertEqual(user_state_cache.get("09121234563")["id"], user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.phone = "09121234573"
+            user.save()
+
+        self.assertIsNone(user_state_cache.get("09121234563"))
+        self.assertEqual(user_state_cache.get("09121234573")["id"], user.id)
+
+
+class LoginTests(APITestCase):
+    def setUp(self):
+        clear_test_keys("default")
+        clear_test_keys("throttle")
+        self.url = reverse("account:login")
+        self.user = User.objects.create(phone="09121234564", is_active=True)
+        self.user.set_password("some_password")
+        self.user.save()
+
+    def tearDown(self):
+        clear_test_keys("throttle")
+
+    def test_login(self):
+        data = {"phone": self.user.phone, "password": "some_password"}
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access_token", response.data["message"])
+
+    @override_settings(PASSWORD_HASHING=dict(settings.PASSWORD_HASHING, ENABLED=True))
+    def test_login_when_hashing_pool_is_broken(self):
+        fallbacks = hashing_executor.stats()["fallbacks"]
+        with patch(
+            "account.core.hashing.ProcessPoolExecutor.submit",
+            side_effect=BrokenProcessPool,
+        ):
+            data = {"phone": self.user.phone, "password": "some_password"}
+            response = self.client.post(self.url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(hashing_executor.stats()["fallbacks"], fallbacks + 1)
+
+    def test_failed_logins_are_counted_once(self):
+        data = {"phone": self.user.phone, "password": "wrong_password"}
+        codes = [self.client.post(self.url, data).status_code for _ in range(4)]
+        self.assertEqual(codes, [403, 403, 403, 429])
+
+    def test_login_wrong_password(self):
+        data = {"phone": self.user.phone, "password": "wrong_password"}
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -14,4 +14,7 @@ urlpatterns = [
     path("active_login/", views.CheckAllActiveLogin.as_view(), name="active_login"),
     path("selected_logout/", views.SelectedLogout.as_view(), name="selected_logout"),
     path("delete_account/", views.DeleteAccount.as_view(), name="delete_account"),
+    path("jwks/", views.JWKSView.as_view(), name="jwks"),
+    path("introspect/", views.TokenIntrospection.as_view(), name="introspect"),
+    path("verify/", views.ForwardAuthView.as_view(), name="verify"),
 ]
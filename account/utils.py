@@ -1,10 +1,9 @@
-import os
-
 from django.core.validators import RegexValidator
-from kavenegar import *
 from rest_framework import exceptions
 
-from achareh.custom_throttle import CustomScopedRateThrottle
+from account.core.sms_providers import get_sms_provider
+
+from achareh.custom_throttle import ThrottleCoordinator
 
 PHONE_REGEX = r"^09\d{9}$"
 phone_number_regex = RegexValidator(regex=PHONE_REGEX)
@@ -13,33 +12,17 @@ JTI_REGEX = r"^[0-9a-fA-F]{32}$"
 
 
 def send_otp_with_sms(phone, code):
-    try:
-        API_KEY = os.environ.get("API_KEY")
-        api = KavenegarAPI(API_KEY)
-
-        params = {
-            "receptor": f"{phone}",
-            "template": "login",
-            "token": f"{code}",
-            "type": "sms",
-        }
-        response = api.verify_lookup(params)
-
-        return code
-
-    except APIException as e:
+    if not get_sms_provider().send_otp(phone, code):
         return False
+    return code
 
-    except HTTPException as e:
-        return False
 
+def check_if_request_is_throttled(request, view, *phones):
+    throttle_durations = ThrottleCoordinator.for_request(request, view).admit(*phones)
+    raise_if_throttled(throttle_durations)
 
-def check_if_request_is_throttled(request, view, phone=None):
-    throttle = CustomScopedRateThrottle(phone)
-    throttle_durations = []
-    if not throttle.allow_request(request, view):
-        throttle_durations.append(throttle.wait())
 
+def raise_if_throttled(throttle_durations):
     if throttle_durations:
         durations = [
             duration for duration in throttle_durations if duration is not None
@@ -49,6 +32,18 @@ def check_if_request_is_throttled(request, view, phone=None):
         raise exceptions.Throttled(duration)
 
 
-def add_request_to_throttle(request, view, phone=None):
-    throttle = CustomScopedRateThrottle(phone)
-    throttle.add_request(request, view)
+# call it before the side effect it counts, the hit was usually reserved by
+# check_if_request_is_throttled and this only keeps it
+def add_request_to_throttle(request, view, *phones):
+    throttle_durations = ThrottleCoordinator.for_request(request, view).record(
+        *(phones or [None])
+    )
+    raise_if_throttled(throttle_durations)
+
+
+def release_request_from_throttle(request, view, *phones):
+    ThrottleCoordinator.for_request(request, view).release(*(phones or [None]))
+
+
+def flush_throttle_records(request, view):
+    ThrottleCoordinator.for_request(request, view).flush()
@@ -1,5 +1,12 @@
-from django.core.cache import caches
+import jwt
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import exceptions, status
+from rest_framework.authentication import get_authorization_header
 from rest_framework.generics import UpdateAPIView, DestroyAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -14,34 +21,42 @@ from account.authentication import (
 from account.core.check_user_phone import (
     get_phone_from_serializer,
 )
+from account.core.introspection import introspect_tokens
+from account.core.keyring import get_keyring
 from account.core.login import get_username_and_password_from_serializer
+from account.core.phone_filter import known_phones_filter
 from account.core.register import (
     create_user_and_set_work_flow_token,
     get_code_and_phone_from_serializer,
     get_main_code_from_cache,
     is_otp_code_correct,
 )
+from account.core.sessions import session_store
 from account.core.tokens import (
-    cache_key_parser,
     create_login_token,
     delete_all_sessions,
+    delete_session,
     check_if_work_flow_token_exists,
+    rotate_login_token,
 )
+from account.core.user_state import user_state_cache
 from account.custom_view import CustomAPIView
 from account.enums.fault_code import FaultCode
 from account.enums.user_state import UserSituation
 from account.mixins import SendOTPMixin
 from account.models import User
 from account.permissions.active_user import IsActiveUser
+from account.permissions.introspection_client import IsIntrospectionClient
 from account.permissions.password_permissions import IsPasswordSet
 from account.serializers import (
     CheckUserPhoneSerializer,
+    IntrospectionSerializer,
     JTISerializer,
     UserLoginSerializer,
     UserRegisterSerializer,
     UserUpdateSerializer,
 )
-from account.utils import add_request_to_throttle
+from account.signals import invalidate_users_on_commit
 
 
 class CheckUserPhone(CustomAPIView, SendOTPMixin):
@@ -53,11 +68,10 @@ class CheckUserPhone(CustomAPIView, SendOTPMixin):
         serializer.is_valid(raise_exception=True)
         phone = get_phone_from_serializer(serializer)
 
-        user = (
-            User.default_objects.filter(phone=phone)
-            .values("is_active", "password", "is_deleted")
-            .first()
-        )
+        if known_phones_filter.is_unknown(phone):
+            return self.handle_new_user(phone, request)
+
+        user = user_state_cache.get(phone)
 
         if not user:
             return self.handle_new_user(phone, request)
@@ -67,7 +81,7 @@ class CheckUserPhone(CustomAPIView, SendOTPMixin):
                 UserSituation.DELETED_ACCOUNT.value, status.HTTP_403_FORBIDDEN
             )
 
-        if not user.get("password") and not user.get("is_active"):
+        if not user.get("has_password") and not user.get("is_active"):
             return self.handle_no_password_user(phone, request)
 
         if not user.get("is_active"):
@@ -173,13 +187,7 @@ class UserLogin(CustomAPIView):
             FaultCode.INVALID_PASSWORD.value,
             FaultCode.WRONG_PHONE_NUMBER.value,
         ]:
-            add_request_to_throttle(request, self)
-            if user in [
-                FaultCode.INVALID_PASSWORD.value,
-                UserSituation.INACTIVE_USER.value,
-            ]:
-                add_request_to_throttle(request, self, phone)
-
+            # the attempt was already counted once by the serializer is_valid method
             raise exceptions.AuthenticationFailed(
                 {"message": [UserSituation.WRONG_PASSWORD_OR_PHONE.value]}
             )
@@ -200,9 +208,15 @@ class RefreshToken(APIView):
         payload = request.auth
 
         jti = payload["jti"]
-        caches["auth"].delete(f"user_{user.id} || {jti}")
+        tokens = rotate_login_token(request, user, jti)
+        if tokens is None:
+            # a concurrent refresh with the same token rotated the session first
+            return Response(
+                {"message": [UserSituation.INVALID_SESSION.value]},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
-        access_token, refresh_token = create_login_token(request, user)
+        access_token, refresh_token = tokens
         data = {"access": access_token, "refresh": refresh_token}
 
         return Response(data, status=status.HTTP_201_CREATED)
@@ -219,7 +233,7 @@ class LogoutView(APIView):
         payload = request.auth
         user = request.user
         jti = payload["jti"]
-        caches["auth"].delete(f"user_{user.id} || {jti}")
+        delete_session(user.id, jti)
         return Response(
             {"message": "Logged out successfully"}, status=status.HTTP_200_OK
         )
@@ -235,16 +249,19 @@ class CheckAllActiveLogin(APIView):
     def get(self, request):
         user = request.user
 
+        last_seen = session_store.get_last_seen(user.id)
         active_login_data = []
-        for key, value in (
-            caches["auth"].get_many(caches["auth"].keys(f"user_{user.id} || *")).items()
-        ):
-            jti = cache_key_parser(key)[1]
-
+        for jti, value in session_store.get_all(user.id).items():
+            # sessions created before metadata was stored hold only the user agent
+            if not isinstance(value, dict):
+                value = {"user_agent": value}
             active_login_data.append(
                 {
                     "jti": jti,
-                    "user_agent": value,
+                    "user_agent": value.get("user_agent"),
+                    "ip": value.get("ip"),
+                    "created_at": value.get("created_at"),
+                    "last_seen": last_seen.get(jti, value.get("created_at")),
                 }
             )
 
@@ -282,7 +299,7 @@ class SelectedLogout(APIView):
         jti = serializer.validated_data["jti"]
         user = request.user
 
-        is_deleted = caches["auth"].delete(f"user_{user.id} || {jti}")
+        is_deleted = delete_session(user.id, jti)
         if not is_deleted:
             return Response(
                 {"message": UserSituation.INVALID_SESSION.value},
@@ -309,7 +326,66 @@ class DeleteAccount(DestroyAPIView):
         instance = self.get_object()
         self.perform_destroy(instance)
         delete_all_sessions(instance.id)
+        invalidate_users_on_commit(instance)
         return Response(
             data={"message": UserSituation.ACCOUNT_DELETED.value},
             status=status.HTTP_204_NO_CONTENT,
         )
+
+
+class JWKSView(APIView):
+    authentication_classes = ()
+    permission_classes = ()
+
+    def get(self, request):
+        keyring = get_keyring()
+        response = Response(
+            keyring.jwks if keyring is not None else {"keys": []},
+            status=status.HTTP_200_OK,
+        )
+        patch_cache_control(
+            response, public=True, max_age=settings.JWT_SIGNING["JWKS_MAX_AGE"]
+        )
+        return response
+
+
+class TokenIntrospection(APIView):
+    authentication_classes = ()
+    permission_classes = (IsIntrospectionClient,)
+    serializer_class = IntrospectionSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = introspect_tokens(serializer.validated_data["tokens"])
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+# answers auth_request/ext_authz subrequests from the reverse proxy, a plain django
+# view without DRF negotiation, throttling or body parsing
+@method_decorator(csrf_exempt, name="dispatch")
+class ForwardAuthView(View):
+    authentication = AccessTokenAuthentication()
+
+    def dispatch(self, request, *args, **kwargs):
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2 or auth[0].lower() != b"token":
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            user, payload = self.authentication.authenticate_credentials(
+                auth[1].decode()
+            )
+        except (exceptions.APIException, jwt.PyJWTError, UnicodeError):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+        if user is None:
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        if not user.is_active:
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+
+        response = HttpResponse(status=status.HTTP_204_NO_CONTENT)
+        response["X-User-Id"] = str(user.id)
+        response["X-Token-Jti"] = payload["jti"]
+        return response
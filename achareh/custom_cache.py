@@ -0,0 +1,50 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis import get_redis_connection
+
+
+def shares_pool(*aliases: str) -> bool:
+    return len({get_redis_connection(alias).connection_pool for alias in aliases}) <= 1
+
+
+# queues commands for several cache aliases and sends them with one pipeline per
+# connection pool, so with REDIS_SHARED_POOL on they all go out in one round trip
+class CachePipeline:
+    def __init__(self, transaction: bool = False):
+        self.transaction = transaction
+        self._pipelines = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+
+    def pipeline(self, alias: str = DEFAULT_CACHE_ALIAS):
+        connection = get_redis_connection(alias)
+        pool = connection.connection_pool
+        if pool not in self._pipelines:
+            self._pipelines[pool] = connection.pipeline(transaction=self.transaction)
+        return self._pipelines[pool]
+
+    def set(self, alias: str, key, value, timeout=DEFAULT_TIMEOUT) -> None:
+        cache = caches[alias]
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = cache.default_timeout
+        self.pipeline(alias).set(
+            cache.make_key(key),
+            cache.client.encode(value),
+            ex=None if timeout is None else int(timeout),
+        )
+
+    def delete(self, alias: str, *keys) -> None:
+        cache = caches[alias]
+        self.pipeline(alias).delete(*(cache.make_key(key) for key in keys))
+
+    def execute(self) -> list:
+        results = []
+        for pipeline in self._pipelines.values():
+            results.extend(pipeline.execute())
+        self._pipelines.clear()
+        return results
@@ -37,3 +37,9 @@ class CommonError(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = _("An error occurred")
     default_code = "error"
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Service Is Overloaded, Please Try Again Later")
+    default_code = "service_overloaded"
@@ -1,24 +1,194 @@
 import json
 import logging
+import os
+import queue
+import threading
 import time
 from datetime import datetime
 
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, helpers
+
+from achareh.custom_log_spool import FSYNC_INTERVAL, LogSpool
 
 
 class ElasticsearchHandler(logging.Handler):
-    def __init__(self, host, port, *args, **kwargs):
+    def __init__(
+        self,
+        host,
+        port,
+        queue_size=10000,
+        batch_size=500,
+        flush_interval=2.0,
+        spool_dir=None,
+        spool_segment_bytes=16 * 1024 * 1024,
+        spool_fsync=FSYNC_INTERVAL,
+        spool_fsync_interval=1.0,
+        retry_interval=30.0,
+        *args,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self.es = Elasticsearch(f"http://{host}:{port}")
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.spool = (
+            LogSpool(
+                spool_dir,
+                segment_bytes=spool_segment_bytes,
+                fsync=spool_fsync,
+                fsync_interval=spool_fsync_interval,
+            )
+            if spool_dir
+            else None
+        )
+
+        self.dropped = 0
+        self.spooled = 0
+        self.shipped = 0
+        self.failed = 0
+        self._retry_at = 0.0
+
+        self._stop = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        self._worker_lock = threading.Lock()
 
     def emit(self, record):
+        try:
+            log_entry = self.build_log_entry(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        self.ensure_worker()
+        try:
+            self.queue.put_nowait(log_entry)
+        except queue.Full:
+            self.spill([log_entry])
+
+    def spill(self, entries):
+        if self.spool is None:
+            self.dropped += len(entries)
+            return
+        try:
+            self.spool.append(entries)
+        except OSError:
+            self.dropped += len(entries)
+            return
+        self.spooled += len(entries)
+
+    def build_log_entry(self, record):
         log_entry = {
             "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
             "level": record.levelname,
         }
         log_entry.update(json.loads(self.format(record)))
+        return {"_index": self.get_index_name(), "_source": log_entry}
+
+    def ensure_worker(self):
+        # the worker thread does not survive a fork, so each process starts its own
+        if self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+
+        with self._worker_lock:
+            if self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(
+                target=self.run, name="elasticsearch-log-shipper", daemon=True
+            )
+            self._worker.start()
+            self._worker_pid = os.getpid()
+
+    def run(self):
+        while not self._stop.is_set():
+            batch = self.collect_batch()
+            if batch:
+                self.ship(batch)
+            if self.spool is not None and self.is_available():
+                self.replay_spool()
+        self.drain()
+
+    def collect_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self.ship(batch)
+                batch = []
+        if batch:
+            self.ship(batch)
+
+    def is_available(self):
+        return time.monotonic() >= self._retry_at
+
+    def ship(self, batch):
+        if not self.is_available():
+            self.spill(batch)
+            return
+        try:
+            self.bulk(batch)
+        except Exception:
+            self._retry_at = time.monotonic() + self.retry_interval
+            self.spill(batch)
+
+    def bulk(self, batch):
+        success, errors = helpers.bulk(self.es, batch, raise_on_error=False)
+        self.shipped += success
+        self.failed += len(errors)
+
+    def replay_spool(self):
+        self.spool.seal()
+        for path in self.spool.pending_segments():
+            claimed = self.spool.claim(path)
+            if claimed is None:
+                continue
+
+            batch = []
+            try:
+                for log_entry in self.spool.read(claimed):
+                    batch.append(log_entry)
+                    if len(batch) >= self.batch_size:
+                        self.bulk(batch)
+                        batch = []
+                if batch:
+                    self.bulk(batch)
+            except Exception:
+                # the whole segment is replayed again later, a few duplicates are
+                # preferred over losing entries
+                self._retry_at = time.monotonic() + self.retry_interval
+                self.spool.release(claimed)
+                return
+
+            self.spool.remove(claimed)
+            # one segment per round keeps fresh entries flowing while catching up
+            return
 
-        self.es.index(index=self.get_index_name(), document=log_entry)
+    def close(self):
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._stop.set()
+            self._worker.join(timeout=self.flush_interval * 2)
+        if self.spool is not None:
+            self.spool.close()
+        super().close()
 
     @staticmethod
     def get_index_name():
@@ -0,0 +1,164 @@
+import json
+import os
+import re
+import socket
+import threading
+import time
+from pathlib import Path
+
+FSYNC_ALWAYS = "always"
+FSYNC_INTERVAL = "interval"
+FSYNC_NEVER = "never"
+
+
+# every process appends to its own ".open" segment, sealed segments are renamed to
+# ".log" and claimed by renaming again, so workers can share one spool directory.
+# Open and claimed segments are named after the host and pid of their owner, since
+# containers sharing the directory can not see each other's processes
+class LogSpool:
+    host = re.sub(r"[^0-9A-Za-z]", "", socket.gethostname())
+
+    def __init__(
+        self,
+        directory,
+        segment_bytes=16 * 1024 * 1024,
+        fsync=FSYNC_INTERVAL,
+        fsync_interval=1.0,
+    ):
+        if fsync not in (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._pid = None
+        self._last_fsync = 0.0
+
+    def append(self, entries):
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with self._lock:
+            segment = self._current_segment()
+            segment.write(lines)
+            segment.flush()
+            self._sync(segment)
+            if segment.tell() >= self.segment_bytes:
+                self._seal()
+
+    def _current_segment(self):
+        if self._file is not None and self._pid != os.getpid():
+            # inherited from the parent process through a fork, leave it to the parent
+            self._file, self._path = None, None
+
+        if self._file is None:
+            self._pid = os.getpid()
+            self._path = self.directory / f"{time.time_ns()}-{self.owner()}.open"
+            self._file = open(self._path, "a", encoding="utf-8")
+        return self._file
+
+    def _sync(self, segment):
+        if self.fsync == FSYNC_NEVER:
+            return
+        now = time.monotonic()
+        if self.fsync == FSYNC_ALWAYS or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(segment.fileno())
+            self._last_fsync = now
+
+    def _seal(self):
+        if self._file is None or self._pid != os.getpid():
+            return
+        if self.fsync != FSYNC_NEVER:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._path.rename(self._path.with_suffix(".log"))
+        self._file, self._path = None, None
+
+    def seal(self):
+        with self._lock:
+            if self._file is not None and self._file.tell() > 0:
+                self._seal()
+
+    def pending_segments(self):
+        self.recover_abandoned()
+        return sorted(self.directory.glob("*.log"))
+
+    def has_pending(self):
+        with self._lock:
+            has_open = self._file is not None and self._file.tell() > 0
+        return has_open or any(self.directory.glob("*.log"))
+
+    def claim(self, path):
+        claimed = path.with_suffix(f".replaying-{self.owner()}")
+        try:
+            path.rename(claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    @staticmethod
+    def read(path):
+        with open(path, encoding="utf-8") as segment:
+            for line in segment:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a torn write from a crash, the rest of the segment is still usable
+                    continue
+
+    @staticmethod
+    def release(path):
+        path.rename(path.with_suffix(".log"))
+
+    @staticmethod
+    def remove(path):
+        path.unlink(missing_ok=True)
+
+    def recover_abandoned(self):
+        for path in self.directory.iterdir():
+            suffix = path.suffix
+            if suffix == ".open":
+                owner = path.stem.rsplit("-", 1)[-1]
+            elif suffix.startswith(".replaying-"):
+                owner = suffix.rsplit("-", 1)[-1]
+            else:
+                continue
+            if not self._is_alive(owner):
+                try:
+                    path.rename(path.with_suffix(".log"))
+                except FileNotFoundError:
+                    continue
+
+    def owner(self):
+        return f"{self.host}_{os.getpid()}"
+
+    def _is_alive(self, owner):
+        host, _, pid = owner.rpartition("_")
+        # segments of another host are left to that host, segments written before
+        # owners carried a host are treated as local
+        if host and host != self.host:
+            return True
+        try:
+            pid = int(pid)
+        except ValueError:
+            return False
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def close(self):
+        with self._lock:
+            self._seal()
@@ -1,19 +1,78 @@
 import json
 import logging
+import random
 import re
 import traceback
+from contextlib import ExitStack
 from uuid import uuid4
 
+from django.conf import settings
+from django.db import connections
 from rest_framework import status
 
 from account.core.general import get_ip_from_request
+from achareh import custom_request_metrics
 
 logger = logging.getLogger("elastic_logger")
 
 
+class APILogPolicy:
+    def __init__(self, config: dict):
+        exclude = "|".join(re.escape(path) for path in config["EXCLUDE"])
+        # an optional two letter language prefix, like /en/admin/
+        self.exclude = re.compile(rf"(/..|)/({exclude})(/.*|)$") if exclude else None
+        self.always_log_status = config["ALWAYS_LOG_STATUS"]
+        self.default_rate = config["DEFAULT_SAMPLE_RATE"]
+
+        self.always_log_names = {
+            route for route in config["ALWAYS_LOG"] if not route.startswith("/")
+        }
+        self.always_log_prefixes = tuple(
+            route for route in config["ALWAYS_LOG"] if route.startswith("/")
+        )
+
+        rates = config["SAMPLE_RATES"]
+        self.rates_by_name = {
+            route: rate for route, rate in rates.items() if not route.startswith("/")
+        }
+        self.rates_by_prefix = sorted(
+            ((route, rate) for route, rate in rates.items() if route.startswith("/")),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+
+    def is_excluded(self, path: str) -> bool:
+        return self.exclude is not None and self.exclude.match(path) is not None
+
+    def sample_rate(self, request, status_code: int) -> float:
+        if status_code >= self.always_log_status:
+            return 1.0
+
+        # ALWAYS_LOG wins over a sample rate set for the same route in any form
+        view_name = getattr(request.resolver_match, "view_name", None)
+        if view_name in self.always_log_names or request.path.startswith(
+            self.always_log_prefixes
+        ):
+            return 1.0
+
+        rate = self.rates_by_name.get(view_name)
+        if rate is not None:
+            return rate
+
+        for prefix, rate in self.rates_by_prefix:
+            if request.path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    @staticmethod
+    def is_sampled(rate: float) -> bool:
+        return rate >= 1 or random.random() < rate
+
+
 class ElasticAPILoggerMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.policy = APILogPolicy(settings.API_LOG_POLICY)
 
     def __call__(self, request):
         unique_id = request.headers.get("unique_id")
@@ -21,23 +80,42 @@ class ElasticAPILoggerMiddleware:
         if not unique_id:
             unique_id = uuid4().hex
         setattr(request, "unique_id", unique_id)
+        setattr(request, "log_excluded", self.policy.is_excluded(request.path))
+        if request.log_excluded:
+            response = self.get_response(request)
+            response.headers["unique_id"] = unique_id
+            return response
+
+        with ExitStack() as stack:
+            metrics = stack.enter_context(custom_request_metrics.collect())
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(custom_request_metrics.sql_timer)
+                )
+            response = self.get_response(request)
 
-        path_blacklist = self.get_blacklist(request)
-        response = self.get_response(request)
         response.headers["unique_id"] = unique_id
-        if len(path_blacklist) == 0 and not request.META.get("exception", False):
+        if request.META.get("exception", False):
+            return response
+
+        sample_rate = self.policy.sample_rate(request, response.status_code)
+        if self.policy.is_sampled(sample_rate):
             user = self.find_user(request)
             log_data = self.api_log_data(request, response, user)
+            log_data["sample_rate"] = sample_rate
+            log_data["cost"] = metrics.as_dict()
             logger.info(json.dumps(log_data))
 
         return response
 
     def process_exception(self, request, exception):
         status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
-        path_blacklist = self.get_blacklist(request)
-        if len(path_blacklist) == 0:
+        if not request.log_excluded:
             log_data = self.exception_log_data(request, exception)
             log_data["response_status"] = status_code
+            metrics = custom_request_metrics.current()
+            if metrics is not None:
+                log_data["cost"] = metrics.as_dict()
             logger.error(json.dumps(log_data))
             request.META["exception"] = True
 
@@ -83,14 +161,3 @@ class ElasticAPILoggerMiddleware:
             ),
             "exception": True,
         }
-
-    @staticmethod
-    def get_blacklist(request):
-        lst = (
-            "admin",
-            "favicon.ico",
-        )
-        path_blacklist = list(
-            filter(lambda x: re.match(rf"(/..|)/({x})(/.*|)$", request.path), lst)
-        )
-        return path_blacklist
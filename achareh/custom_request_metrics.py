@@ -0,0 +1,133 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from redis import Redis
+from redis.client import Pipeline
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.redis = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        self.sms_count = 0
+        self.sms_seconds = 0.0
+
+    def add_sql(self, seconds: float) -> None:
+        self.sql_count += 1
+        self.sql_seconds += seconds
+
+    def add_redis(self, alias: str, seconds: float, commands: int = 1) -> None:
+        self.redis[alias]["count"] += commands
+        self.redis[alias]["seconds"] += seconds
+
+    def add_sms(self, seconds: float) -> None:
+        self.sms_count += 1
+        self.sms_seconds += seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "duration_ms": to_ms(
+                (self.finished_at or time.perf_counter()) - self.started_at
+            ),
+            "sql_count": self.sql_count,
+            "sql_ms": to_ms(self.sql_seconds),
+            "redis_count": sum(item["count"] for item in self.redis.values()),
+            "redis_ms": to_ms(sum(item["seconds"] for item in self.redis.values())),
+            "redis": {
+                alias: {"count": item["count"], "ms": to_ms(item["seconds"])}
+                for alias, item in self.redis.items()
+            },
+            "sms_count": self.sms_count,
+            "sms_ms": to_ms(self.sms_seconds),
+        }
+
+
+def to_ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        metrics.finished_at = time.perf_counter()
+        _current.reset(token)
+
+
+def sql_timer(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_sql(time.perf_counter() - start)
+
+
+def record_sms(seconds: float) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_sms(seconds)
+
+
+# plugged into django-redis through REDIS_CLIENT_CLASS, so every command sent through
+# a cache alias, its raw connection, pipelines and lua scripts is accounted for
+class InstrumentedRedis(Redis):
+    def __init__(self, *args, alias: str = "default", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.alias = alias
+
+    def execute_command(self, *args, **options):
+        metrics = _current.get()
+        if metrics is None:
+            return super().execute_command(*args, **options)
+
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            metrics.add_redis(self.alias, time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(
+            self.alias,
+            self.connection_pool,
+            self.response_callbacks,
+            transaction,
+            shard_hint,
+        )
+
+
+class InstrumentedPipeline(Pipeline):
+    def __init__(self, alias: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.alias = alias
+
+    def execute(self, raise_on_error=True):
+        metrics = _current.get()
+        commands = len(self.command_stack)
+        if metrics is None or not commands:
+            return super().execute(raise_on_error)
+
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            metrics.add_redis(self.alias, time.perf_counter() - start, commands)
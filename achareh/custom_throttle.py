@@ -1,52 +1,128 @@
+from functools import lru_cache
+from uuid import uuid4
+
 from django.core.cache import caches
+from django_redis import get_redis_connection
 from rest_framework.throttling import ScopedRateThrottle
 
+# every window of a request is checked and, only when all of them have room, takes the
+# hit in the same call, so concurrent requests can not push a window past its limit
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local results = {1}
+for i, key in ipairs(KEYS) do
+    local duration = tonumber(ARGV[i * 2 + 1])
+    local limit = tonumber(ARGV[i * 2 + 2])
+    redis.call("ZREMRANGEBYSCORE", key, "-inf", now - duration)
+    local count = redis.call("ZCARD", key)
+    if count >= limit then
+        results[1] = 0
+    end
+    local oldest = redis.call("ZRANGE", key, 0, 0, "WITHSCORES")
+    table.insert(results, count)
+    table.insert(results, oldest[2] or false)
+end
+
+if results[1] == 1 then
+    for i, key in ipairs(KEYS) do
+        redis.call("ZADD", key, now, ARGV[2])
+        redis.call("EXPIRE", key, math.ceil(tonumber(ARGV[i * 2 + 1])))
+    end
+end
+return results
+"""
+
+
+class SlidingWindowThrottleEngine:
+    def __init__(self, alias):
+        self.alias = alias
+        self._script = None
+
+    @property
+    def script(self):
+        if self._script is None:
+            self._script = get_redis_connection(self.alias).register_script(
+                SLIDING_WINDOW_SCRIPT
+            )
+        return self._script
+
+    def admit(self, throttles, now, member):
+        args = [now, member]
+        for throttle in throttles:
+            args.extend([throttle.duration, throttle.num_requests])
+
+        admitted, *windows = self.script(
+            keys=[caches[self.alias].make_key(throttle.key) for throttle in throttles],
+            args=args,
+        )
+        for throttle, count, oldest in zip(throttles, windows[::2], windows[1::2]):
+            throttle.now = now
+            throttle.count = int(count)
+            throttle.oldest = float(oldest) if oldest else None
+        return bool(admitted)
+
+    def release(self, throttles, member):
+        pipe = get_redis_connection(self.alias).pipeline(transaction=False)
+        for throttle in throttles:
+            pipe.zrem(caches[self.alias].make_key(throttle.key), member)
+        pipe.execute()
+
 
 class CustomScopedRateThrottle(ScopedRateThrottle):
     scope_attr = "custom_throttle_scope"
     cache = caches["throttle"]
+    cache_format = "throttle_window_%(scope)s_%(ident)s"
+    engine = SlidingWindowThrottleEngine("throttle")
 
     def __init__(self, phone=None):
         self.phone = phone
+        self.count = 0
+        self.oldest = None
 
-    def allow_request(self, request, view):
+    def prepare(self, request, view):
         self.scope = self.get_scope(view)
 
         if not self.scope:
-            return True
+            return False
 
         self.rate = self.get_rate()
         self.num_requests, self.duration = self.parse_rate(self.rate)
 
         if self.rate is None:
-            return True
+            return False
 
         self.key = self.get_cache_key(request)
         if self.key is None:
-            return True
-
-        self.history = self.get_history(request)
-        self.now = self.timer()
-
-        while self.history and self.history[-1] <= self.now - self.duration:
-            self.history.pop()
-        if len(self.history) >= self.num_requests:
             return False
-        return True
 
-    def add_request(self, request, view):
-        self.scope = self.get_scope(view)
-        self.rate = self.get_rate()
-        self.num_requests, self.duration = self.parse_rate(self.rate)
-        self.history = self.get_history(request)
         self.now = self.timer()
-        self.history.insert(0, self.now)
-        self.cache.set(self.key, self.history, self.duration)
         return True
 
-    def get_history(self, request):
-        self.key = self.get_cache_key(request)
-        return self.cache.get(self.key, [])
+    def allow_request(self, request, view):
+        if not self.prepare(request, view):
+            return True
+
+        return self.engine.admit([self], self.now, f"{self.now}:{uuid4().hex[:8]}")
+
+    def is_allowed(self):
+        return self.count < self.num_requests
+
+    def wait(self):
+        if self.oldest is not None:
+            remaining_duration = self.duration - (self.now - self.oldest)
+        else:
+            remaining_duration = self.duration
+
+        available_requests = self.num_requests - self.count + 1
+        if available_requests <= 0:
+            return None
+
+        return remaining_duration / float(available_requests)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def parse_rate(rate):
+        return ScopedRateThrottle.parse_rate(None, rate)
 
     def get_cache_key(self, request):
         if self.phone:
@@ -58,3 +134,63 @@ class CustomScopedRateThrottle(ScopedRateThrottle):
 
     def get_scope(self, view):
         return getattr(view, self.scope_attr, None)
+
+
+# CustomAPIView.initial reserves a hit on every window of the request in one script
+# call, before the view has any side effect. The view marks the hits it counts with
+# record(), and the reservations it did not use are given back when the response is
+# finalized
+class ThrottleCoordinator:
+    throttle_class = CustomScopedRateThrottle
+
+    def __init__(self, request, view):
+        self.request = request
+        self.view = view
+        self.member = uuid4().hex
+        self.reserved = {}
+        self.used = set()
+
+    @classmethod
+    def for_request(cls, request, view):
+        coordinator = getattr(request, "throttle_coordinator", None)
+        if coordinator is None:
+            coordinator = cls(request, view)
+            request.throttle_coordinator = coordinator
+        return coordinator
+
+    def admit(self, *phones):
+        throttles = []
+        for phone in dict.fromkeys(phones):
+            if phone in self.reserved:
+                continue
+            throttle = self.throttle_class(phone)
+            if throttle.prepare(self.request, self.view):
+                throttles.append(throttle)
+
+        if not throttles:
+            return []
+
+        engine = self.throttle_class.engine
+        if engine.admit(throttles, throttles[0].now, self.member):
+            self.reserved.update((throttle.phone, throttle) for throttle in throttles)
+            return []
+        return [throttle.wait() for throttle in throttles if not throttle.is_allowed()]
+
+    def record(self, *phones):
+        throttle_durations = self.admit(*phones)
+        if not throttle_durations:
+            self.used.update(phones)
+        return throttle_durations
+
+    def release(self, *phones):
+        self.used.difference_update(phones)
+
+    def flush(self):
+        unused = [
+            throttle
+            for phone, throttle in self.reserved.items()
+            if phone not in self.used
+        ]
+        self.reserved, self.used = {}, set()
+        if unused:
+            self.throttle_class.engine.release(unused, self.member)
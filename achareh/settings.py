@@ -139,6 +139,56 @@ REDIS_WORK_FLOW_TTL = 60 * 5
 ACCESS_TOKEN_TTL = 60 * 60 * 24 * 1
 REFRESH_TOKEN_TTL = 60 * 60 * 24 * 14
 
+# "EdDSA" or "RS256" sign tokens with the "<kid>.pem" keys in KEYS_DIR and publish the
+# public keys at /account/jwks/. To rotate, add the new key, deploy, then switch
+# ACTIVE_KID and keep the old key as "<kid>.pub.pem" until its tokens have expired.
+# Turn HMAC_FALLBACK off once the HS256 tokens issued before the switch have expired
+JWT_SIGNING = {
+    "ALGORITHM": os.environ.get("JWT_ALGORITHM", "HS256"),
+    "KEYS_DIR": os.environ.get("JWT_KEYS_DIR", BASE_DIR / "jwt_keys"),
+    "ACTIVE_KID": os.environ.get("JWT_ACTIVE_KID"),
+    "HMAC_FALLBACK": os.environ.get("JWT_HMAC_FALLBACK", "true") == "true",
+    "JWKS_MAX_AGE": 60 * 10,
+}
+
+# gateways send one of these keys in the X-Introspection-Key header
+INTROSPECTION = {
+    "CLIENT_KEYS": [
+        key for key in os.environ.get("INTROSPECTION_CLIENT_KEYS", "").split(",") if key
+    ],
+    "MAX_TOKENS": 100,
+}
+
+# short lived access tokens checked by signature and a locally kept list of revoked
+# jtis instead of a redis lookup per request, refresh tokens stay session backed
+STATELESS_ACCESS_TOKENS = {
+    "ENABLED": os.environ.get("STATELESS_ACCESS_TOKENS", "false") == "true",
+    "TTL": 60 * 5,
+    "REFRESH_INTERVAL": 1,
+}
+
+USER_CACHE = {
+    "LOCAL_TTL": 5,
+    "LOCAL_MAX_SIZE": 10000,
+    "SHARED_TTL": 60 * 5,
+}
+USER_STATE_TTL = 60 * 2
+
+# last seen times of sessions are collected in process and written in batches
+SESSION_ACTIVITY = {
+    "ENABLED": True,
+    "FLUSH_INTERVAL": 5,
+    "MAX_PENDING": 100000,
+}
+
+PASSWORD_HASHING = {
+    "ENABLED": os.environ.get("PASSWORD_HASHING_POOL", "true") == "true",
+    "WORKERS": os.cpu_count() or 1,
+    "MAX_PENDING": (os.cpu_count() or 1) * 4,
+    "ACQUIRE_TIMEOUT": 2,
+    "START_METHOD": "spawn",
+}
+
 
 CACHES = {
     "default": {
@@ -147,6 +197,8 @@ CACHES = {
         "OPTIONS": {
             "SERIALIZER": "django_redis.serializers.json.JSONSerializer",
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "REDIS_CLIENT_CLASS": "achareh.custom_request_metrics.InstrumentedRedis",
+            "REDIS_CLIENT_KWARGS": {"alias": "default"},
         },
     },
     "auth": {
@@ -156,6 +208,8 @@ CACHES = {
         "OPTIONS": {
             "SERIALIZER": "django_redis.serializers.json.JSONSerializer",
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "REDIS_CLIENT_CLASS": "achareh.custom_request_metrics.InstrumentedRedis",
+            "REDIS_CLIENT_KWARGS": {"alias": "auth"},
         },
     },
     "otp": {
@@ -165,6 +219,8 @@ CACHES = {
         "OPTIONS": {
             "SERIALIZER": "django_redis.serializers.json.JSONSerializer",
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "REDIS_CLIENT_CLASS": "achareh.custom_request_metrics.InstrumentedRedis",
+            "REDIS_CLIENT_KWARGS": {"alias": "otp"},
         },
     },
     "throttle": {
@@ -174,6 +230,8 @@ CACHES = {
         "OPTIONS": {
             "SERIALIZER": "django_redis.serializers.json.JSONSerializer",
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "REDIS_CLIENT_CLASS": "achareh.custom_request_metrics.InstrumentedRedis",
+            "REDIS_CLIENT_KWARGS": {"alias": "throttle"},
         },
     },
     "work_flow": {
@@ -183,10 +241,38 @@ CACHES = {
         "OPTIONS": {
             "SERIALIZER": "django_redis.serializers.json.JSONSerializer",
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "REDIS_CLIENT_CLASS": "achareh.custom_request_metrics.InstrumentedRedis",
+            "REDIS_CLIENT_KWARGS": {"alias": "work_flow"},
         },
     },
 }
 
+# every alias on database 0 of one server with its own key prefix, so a worker holds
+# a single connection pool and commands for several aliases can share a pipeline
+REDIS_SHARED_POOL = os.environ.get("REDIS_SHARED_POOL", "false") == "true"
+if REDIS_SHARED_POOL:
+    for cache_alias, cache_config in CACHES.items():
+        cache_config["LOCATION"] = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+        # "default" already lives on database 0, its keys stay valid unprefixed
+        if cache_alias != "default":
+            cache_config["KEY_PREFIX"] = cache_alias
+
+# aliases listed here read both payload formats, turn COMPACT_CACHE_WRITES on once
+# every process is deployed with the reader
+COMPACT_CACHE_ALIASES = [
+    alias for alias in os.environ.get("COMPACT_CACHE_ALIASES", "").split(",") if alias
+]
+COMPACT_CACHE_WRITES = os.environ.get("COMPACT_CACHE_WRITES", "false") == "true"
+for cache_alias in COMPACT_CACHE_ALIASES:
+    CACHES[cache_alias]["OPTIONS"].update(
+        {
+            "SERIALIZER": "achareh.custom_serializer.CompactSerializer",
+            "COMPRESSOR": "achareh.custom_serializer.ThresholdZlibCompressor",
+            "COMPACT_WRITES": COMPACT_CACHE_WRITES,
+            "COMPRESS_MIN_LENGTH": 256,
+        }
+    )
+
 AUTHENTICATION_BACKENDS = [
     "django.contrib.auth.backends.ModelBackend",
     "account.authentication.PhoneAuthBackend",
@@ -201,9 +287,53 @@ REST_FRAMEWORK = {
 }
 
 
+# lets check_phone answer for unregistered phones without querying the database, run
+# "manage.py rebuild_known_phones" once after enabling it
+KNOWN_PHONES_FILTER = {
+    "ENABLED": os.environ.get("KNOWN_PHONES_FILTER_ENABLED", "false") == "true",
+    "SIZE_BITS": 2**24,
+    "HASHES": 7,
+}
+
+# "outbox" queues OTPs for the otp_worker command, "sync" sends them inside the request
+OTP_DELIVERY = os.environ.get("OTP_DELIVERY", "outbox")
+SMS_PROVIDER = os.environ.get(
+    "SMS_PROVIDER", "account.core.sms_providers.KavenegarProvider"
+)
+SMS_PROVIDER_OPTIONS = {
+    "CONNECT_TIMEOUT": 3,
+    "READ_TIMEOUT": 5,
+    "POOL_SIZE": 10,
+    "FAILURE_RATE_THRESHOLD": 0.5,
+    "MIN_CALLS": 10,
+    "WINDOW": 30,
+    "OPEN_SECONDS": 30,
+}
+OTP_OUTBOX = {
+    "CONCURRENCY": 8,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_BACKOFF": 2,
+    "CLAIM_IDLE_MS": 30 * 1000,
+    "MAX_LENGTH": 100000,
+}
+
+
 ELASTICSEARCH_HOST = os.environ.get("ELASTICSEARCH_HOST")
 ELASTICSEARCH_PORT = os.environ.get("ELASTICSEARCH_PORT")
 
+# routes are url names ("account:login") or path prefixes ("/account/"), responses at
+# or above ALWAYS_LOG_STATUS and exceptions are logged regardless of the sample rate
+API_LOG_POLICY = {
+    "EXCLUDE": ("admin", "favicon.ico", "account/verify"),
+    "ALWAYS_LOG": (),
+    "ALWAYS_LOG_STATUS": 400,
+    "DEFAULT_SAMPLE_RATE": 1.0,
+    "SAMPLE_RATES": {
+        "account:active_login": 0.1,
+        "account:token_refresh": 0.1,
+    },
+}
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -213,6 +343,12 @@ LOGGING = {
             "class": "achareh.custom_log_handler.ElasticsearchHandler",
             "host": ELASTICSEARCH_HOST,
             "port": ELASTICSEARCH_PORT,
+            "queue_size": 10000,
+            "batch_size": 500,
+            "flush_interval": 2.0,
+            "spool_dir": os.environ.get("LOG_SPOOL_DIR", BASE_DIR / "log_spool"),
+            "spool_fsync": os.environ.get("LOG_SPOOL_FSYNC", "interval"),
+            "retry_interval": 30.0,
         },
         "console": {
             "level": "INFO",
@@ -0,0 +1,353 @@
+"""
+Load benchmark for the account API.
+
+Start the stand-ins and prepare the schema once:
+
+    docker compose -f benchmarks/docker-compose.yml up -d
+    python manage.py migrate --settings=benchmarks.settings
+
+Then run the flows, in-process through the full WSGI/middleware stack:
+
+    python -m benchmarks.account_load --flows 500 --concurrency 16 --output run.json
+
+or over HTTP against a server started with the same settings:
+
+    python manage.py runserver 8001 --settings=benchmarks.settings --noreload
+    python -m benchmarks.account_load --base-url http://localhost:8001 --output run.json
+
+Each flow registers a fresh phone and walks check_phone -> register -> update ->
+login -> refresh -> active_login -> logout_all. After the load pass a short serial
+pass runs in-process to count SQL queries and Redis commands per endpoint. Pass
+--baseline with an earlier output file to print the change per endpoint.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import requests  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django_redis import get_redis_connection  # noqa: E402
+
+PASSWORD = "Bench-Passw0rd!x"
+
+ENDPOINTS = (
+    "check_phone",
+    "register",
+    "update",
+    "login",
+    "token_refresh",
+    "active_login",
+    "logout_all",
+)
+
+
+class FlowError(Exception):
+    pass
+
+
+def decode_body(content):
+    try:
+        return json.loads(content)
+    except ValueError:
+        return content[:200]
+
+
+class InProcessTransport:
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {"HTTP_AUTHORIZATION": f"Token {token}"} if token else {}
+        if method == "get":
+            response = self.client.get(path, **headers)
+        else:
+            response = getattr(self.client, method)(
+                path,
+                data=json.dumps(data or {}),
+                content_type="application/json",
+                **headers,
+            )
+        return response.status_code, decode_body(response.content)
+
+
+class HTTPTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {"Authorization": f"Token {token}"} if token else {}
+        response = self.session.request(
+            method, f"{self.base_url}{path}", json=data, headers=headers
+        )
+        return response.status_code, decode_body(response.content)
+
+
+class ProfilingTransport(InProcessTransport):
+    def __init__(self):
+        super().__init__()
+        self.redis = get_redis_connection("default")
+        self.samples = defaultdict(lambda: {"sql_queries": [], "redis_commands": []})
+        self.current = None
+
+    def request(self, method, path, data=None, token=None):
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        redis_before = self.redis_calls()
+        with connection.execute_wrapper(count_query):
+            result = super().request(method, path, data, token)
+        redis_commands = self.redis_calls() - redis_before
+
+        self.samples[self.current]["sql_queries"].append(len(queries))
+        self.samples[self.current]["redis_commands"].append(redis_commands)
+        return result
+
+    def redis_calls(self):
+        stats = self.redis.info("commandstats")
+        # the INFO call that produced the previous snapshot is part of the delta
+        return sum(
+            value["calls"] for key, value in stats.items() if key != "cmdstat_info"
+        )
+
+    def summary(self):
+        return {
+            endpoint: {
+                counter: statistics.mean(values) for counter, values in samples.items()
+            }
+            for endpoint, samples in self.samples.items()
+        }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, is_error):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if is_error:
+                self.errors[endpoint] += 1
+
+
+def random_phone():
+    return "09" + "".join(random.choices(string.digits, k=9))
+
+
+def step(transport, recorder, endpoint, method, expected, data=None, token=None):
+    if isinstance(transport, ProfilingTransport):
+        transport.current = endpoint
+
+    start = time.perf_counter()
+    status_code, body = transport.request(
+        method, reverse(f"account:{endpoint}"), data, token
+    )
+    is_error = status_code != expected
+    recorder.record(endpoint, time.perf_counter() - start, is_error)
+
+    if is_error:
+        raise FlowError(f"{endpoint} answered {status_code}: {body}")
+    return body
+
+
+def run_flow(transport, recorder):
+    phone = random_phone()
+    step(transport, recorder, "check_phone", "post", 404, {"phone": phone})
+
+    code = caches["otp"].get(phone)
+    body = step(
+        transport, recorder, "register", "post", 201, {"phone": phone, "code": code}
+    )
+    work_flow_token = body["message"]["work_flow_token"]
+
+    step(
+        transport,
+        recorder,
+        "update",
+        "put",
+        200,
+        {"first_name": "Bench", "last_name": "User", "password": PASSWORD},
+        token=work_flow_token,
+    )
+
+    body = step(
+        transport,
+        recorder,
+        "login",
+        "post",
+        200,
+        {"phone": phone, "password": PASSWORD},
+    )
+    refresh_token = body["message"]["refresh_token"]
+
+    body = step(transport, recorder, "token_refresh", "post", 201, token=refresh_token)
+
+    step(transport, recorder, "active_login", "get", 200, token=body["access"])
+    step(transport, recorder, "logout_all", "get", 200, token=body["refresh"])
+
+
+def run_load(make_transport, flows, concurrency):
+    recorder = Recorder()
+    failures = []
+    local = threading.local()
+
+    def worker(_):
+        if not hasattr(local, "transport"):
+            local.transport = make_transport()
+        try:
+            run_flow(local.transport, recorder)
+        except FlowError as e:
+            failures.append(str(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(flows)))
+    elapsed = time.perf_counter() - start
+    return recorder, elapsed, failures
+
+
+def percentile(quantiles, n):
+    return quantiles[n - 1] * 1000
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        latencies = recorder.latencies.get(endpoint)
+        if not latencies:
+            continue
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        else:
+            quantiles = latencies * 99
+        endpoints[endpoint] = {
+            "count": len(latencies),
+            "errors": recorder.errors[endpoint],
+            "rps": len(latencies) / elapsed,
+            "mean_ms": statistics.mean(latencies) * 1000,
+            "p50_ms": percentile(quantiles, 50),
+            "p95_ms": percentile(quantiles, 95),
+            "p99_ms": percentile(quantiles, 99),
+        }
+
+    total = sum(endpoint["count"] for endpoint in endpoints.values())
+    return {
+        "requests": total,
+        "errors": sum(recorder.errors.values()),
+        "seconds": elapsed,
+        "rps": total / elapsed if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def print_report(result, baseline=None, out=sys.stderr):
+    load, profile = result["load"], result["profile"]
+    out.write(
+        f'{load["requests"]} requests in {load["seconds"]:.2f}s, '
+        f'{load["rps"]:.1f} req/s, {load["errors"]} errors\n'
+    )
+    out.write(
+        f'{"endpoint":<14}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+        f'{"sql":>6}{"redis":>7}\n'
+    )
+    for endpoint, stats in load["endpoints"].items():
+        counts = profile.get(endpoint, {})
+        out.write(
+            f'{endpoint:<14}{stats["rps"]:>9.1f}{stats["p50_ms"]:>9.2f}'
+            f'{stats["p95_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}'
+            f'{counts.get("sql_queries", 0):>6.1f}'
+            f'{counts.get("redis_commands", 0):>7.1f}\n'
+        )
+
+    if baseline is None:
+        return
+    out.write("\nchange against baseline\n")
+    for endpoint, stats in load["endpoints"].items():
+        before = baseline["load"]["endpoints"].get(endpoint)
+        if not before:
+            continue
+        changes = [
+            f"{key} {(stats[key] - before[key]) / before[key] * 100:+.1f}%"
+            for key in ("rps", "p50_ms", "p99_ms")
+            if before[key]
+        ]
+        out.write(f'{endpoint:<14}{"  ".join(changes)}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--flows", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--profile-flows", type=int, default=5)
+    parser.add_argument("--base-url", help="drive a running server over HTTP")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--baseline", help="JSON result of an earlier run")
+    args = parser.parse_args()
+
+    if args.base_url:
+        make_transport = lambda: HTTPTransport(args.base_url)  # noqa: E731
+    else:
+        make_transport = InProcessTransport
+
+    recorder, elapsed, failures = run_load(make_transport, args.flows, args.concurrency)
+
+    profiler = ProfilingTransport()
+    for _ in range(args.profile_flows):
+        try:
+            run_flow(profiler, Recorder())
+        except FlowError as e:
+            failures.append(str(e))
+
+    result = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "transport": "http" if args.base_url else "in_process",
+            "base_url": args.base_url,
+            "flows": args.flows,
+            "concurrency": args.concurrency,
+            "profile_flows": args.profile_flows,
+        },
+        "load": summarize(recorder, elapsed),
+        "profile": profiler.summary(),
+        "failures": failures[:20],
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
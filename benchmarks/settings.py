@@ -0,0 +1,43 @@
+import os
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6380")
+
+from achareh.settings import *  # noqa: E402,F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ["*"]
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("BENCH_DB_NAME", "achareh_bench"),
+        "HOST": os.environ.get("BENCH_DB_HOST", "localhost"),
+        "PORT": os.environ.get("BENCH_DB_PORT", "5433"),
+        "USER": os.environ.get("BENCH_DB_USER", "bench"),
+        "PASSWORD": os.environ.get("BENCH_DB_PASSWORD", "bench"),
+        "CONN_MAX_AGE": 60,
+    }
+}
+
+OTP_DELIVERY = "sync"
+SMS_PROVIDER = "account.core.sms_providers.FakeSMSProvider"
+
+REST_FRAMEWORK = {
+    "DEFAULT_THROTTLE_RATES": {
+        "register": "1000000/hour",
+        "login": "1000000/hour",
+        "check_phone": "1000000/hour",
+    }
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"null": {"class": "logging.NullHandler"}},
+    "loggers": {
+        "elastic_logger": {"handlers": ["null"], "propagate": False},
+        "django.request": {"handlers": ["null"], "propagate": False},
+    },
+}